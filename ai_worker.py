@@ -0,0 +1,210 @@
+"""Computer moves computed off the Tk main thread"""
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import engine
+import metrics
+
+# How often the Tk loop checks for a finished move
+POLL_MS = 15
+
+
+def strategy_name(strategy):
+    """Difficulty level a strategy belongs to, for labelling metrics"""
+    for name, known in engine.STRATEGIES.items():
+        if known is strategy:
+            return name
+    return getattr(strategy, '__name__', 'unknown')
+
+
+def likely_player_moves(board):
+    """Every free cell, the ones the engine would consider first leading"""
+    moves = board.ordered_moves("X")
+    listed = set(moves)
+    return moves + [cell for cell in board.empty_cells() if cell not in listed]
+
+
+class MoveWorker:
+    """Runs AI strategies on a background thread and hands moves back to Tk
+
+    Only one move (or pondering session) is ever in flight. Results come back through a queue
+    that the Tk loop polls with root.after, so widgets are only touched
+    from the main thread. A single worker thread (rather than a process
+    pool) keeps the shared transposition tables and the memory-mapped
+    perfect-play table warm between moves.
+
+    root only needs Tk's after and after_cancel, so the game passes its
+    FrameScheduler and the "thinking" delay runs on the shared timer.
+
+    Positions come in as immutable GameStates. The worker thread builds
+    its own Board from the state, so nothing the search touches is ever
+    shared with the Tk thread, and two workers can be handed the same
+    state. Each worker's searches run under its own cancel token, so
+    cancelling one worker never stops another's search.
+    """
+
+    def __init__(self, root, min_delay_ms=600):
+        self.root = root
+        self.min_delay_ms = min_delay_ms
+        # Cancelled and replaced by every cancel
+        self.token = engine.CancelToken()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xo-ai")
+        self.results = queue.Queue()
+        self.request_id = 0
+        self.poll_id = None
+        # Replies computed while the player was thinking, keyed by position
+        self.ponder_id = 0
+        self.ponder_strategy = None
+        self.pondered = {}
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    @property
+    def busy(self):
+        """Check if a move is being computed or waiting to be shown"""
+        return self.poll_id is not None
+
+    def request(self, state, strategy, callback):
+        """Compute strategy(state.board()) in the background, then call callback(move)
+
+        The callback never runs sooner than min_delay_ms after the request,
+        so instant answers still read as the computer "thinking", but slow
+        searches add no extra delay on top. A reply found by pondering is
+        delivered straight away.
+        """
+        if strategy is self.ponder_strategy:
+            key = (state.x, state.o)
+            if key in self.pondered:
+                move = self.pondered[key]
+                self.ponder_hits += 1
+                if metrics.enabled:
+                    metrics.count(f"moves.{strategy_name(strategy)}")
+                self.cancel()
+                self.poll_id = self.root.after(0, self._deliver, callback, move)
+                return
+            self.ponder_misses += 1
+        self.cancel()
+        self.request_id += 1
+        request_id = self.request_id
+        started = time.perf_counter()
+        token = self.token
+
+        def work():
+            board = state.board()
+            try:
+                with engine.cancel_scope(token):
+                    if metrics.enabled:
+                        result = (self._measured(strategy, board), None)
+                    else:
+                        result = (strategy(board), None)
+            except engine.SearchCancelled:
+                return
+            except Exception as error:
+                result = (None, error)
+            self.results.put((request_id, result))
+
+        self.executor.submit(work)
+        self.poll_id = self.root.after(POLL_MS, self._poll, request_id, started, callback)
+
+    @staticmethod
+    def _measured(strategy, board):
+        """Run strategy(board), recording its latency under its difficulty"""
+        name = strategy_name(strategy)
+        start = time.perf_counter()
+        move = metrics.profiled(strategy, board)
+        metrics.observe(f"move.{name}", (time.perf_counter() - start) * 1000)
+        metrics.count(f"moves.{name}")
+        return move
+
+    def _poll(self, request_id, started, callback):
+        """Deliver the result on the Tk thread once it is ready and due"""
+        self.poll_id = None
+        while True:
+            try:
+                finished_id, result = self.results.get_nowait()
+            except queue.Empty:
+                self.poll_id = self.root.after(POLL_MS, self._poll, request_id,
+                                               started, callback)
+                return
+            # Results of cancelled requests are simply dropped
+            if finished_id == request_id:
+                break
+
+        move, error = result
+        if error is not None:
+            raise error
+        remaining_ms = self.min_delay_ms - (time.perf_counter() - started) * 1000
+        if remaining_ms > 0:
+            self.poll_id = self.root.after(int(remaining_ms), self._deliver, callback, move)
+        else:
+            callback(move)
+
+    def _deliver(self, callback, move):
+        """Hand a delayed move to the callback"""
+        self.poll_id = None
+        callback(move)
+
+    def ponder(self, state, strategy):
+        """Precompute strategy's replies to the player's moves in the background
+
+        The player's likeliest moves are tried first. Pondering stops as
+        soon as the next request or cancel comes in. Master is never
+        pondered: each hypothetical search would re-root the shared MCTS
+        tree away from the real game and throw away the tree it reuses.
+        """
+        self.cancel()
+        level = strategy_name(strategy)
+        if level == 'Master':
+            return
+        # Only the worker that ponders reports ponder stats
+        metrics.add_source('ponder', self.ponder_stats)
+        ponder_id = self.ponder_id
+        pondered = self.pondered
+        self.ponder_strategy = strategy
+        token = self.token
+
+        def work():
+            board = state.board()
+            for cell in likely_player_moves(board):
+                if ponder_id != self.ponder_id:
+                    return
+                board.make(cell, "X")
+                try:
+                    if not board.player_won(level) and not board.is_board_full():
+                        with engine.cancel_scope(token):
+                            pondered[(board.x, board.o)] = strategy(board)
+                except engine.SearchCancelled:
+                    return
+                finally:
+                    board.unmake(cell, "X")
+
+        self.executor.submit(work)
+
+    def ponder_stats(self):
+        """Return ponder hit/miss counters as a dict"""
+        lookups = self.ponder_hits + self.ponder_misses
+        return {
+            'hits': self.ponder_hits,
+            'misses': self.ponder_misses,
+            'hit_rate': self.ponder_hits / lookups if lookups else 0.0,
+            'pondered': len(self.pondered),
+        }
+
+    def cancel(self):
+        """Drop the pending move and any pondering, and stop their searches"""
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        # Any result still on its way is ignored by id
+        self.request_id += 1
+        self.ponder_id += 1
+        self.ponder_strategy = None
+        self.pondered = {}
+        self.token.cancel()
+        self.token = engine.CancelToken()
+
+    def shutdown(self):
+        """Cancel pending work and stop the worker thread"""
+        self.cancel()
+        self.executor.shutdown(wait=False)
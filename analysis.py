@@ -0,0 +1,115 @@
+"""Minimax value of every free cell, for the analysis overlay
+
+For each cell the player (X) could take, the analyzer finds the result
+with best play afterwards: a win or loss and in how many plies, or a
+draw. On the 3x3 board these come from the perfect-play table when it
+exists, and otherwise come from a full search. Every other board gets a
+short search per cell, and a cell whose result is not settled within
+that budget is shown as unclear. Boards larger than 16 cells only search
+the candidate cells from Board.ordered_moves, so nothing found there is
+proven: their wins and losses are marked as estimates and they never
+show a draw.
+
+Each geometry has its own search and transposition table, separate
+from the computer's, so the analysis can run on its own thread. The
+table persists from move to move, so each position reuses what the
+last one found. Finished analyses are cached by position.
+"""
+from collections import OrderedDict, namedtuple
+
+import engine
+
+WIN = "win"
+DRAW = "draw"
+LOSS = "loss"
+UNCLEAR = "unclear"
+
+# Search time per cell on boards too large to solve
+BUDGET_MS = 40
+
+
+class CellValue(namedtuple('CellValue', 'outcome plies estimate exact')):
+    """Result for X of playing a cell
+
+    plies counts until a forced win or loss. estimate is the horizon
+    evaluation for unclear cells, from -1 (bad for X) to 1 (good for X).
+    exact is False when the search behind a win or loss skipped moves.
+    """
+
+    @property
+    def label(self):
+        """Short text for the board, e.g. W3, L2, W3?, D or +0.4"""
+        mark = "" if self.exact else "?"
+        if self.outcome == WIN:
+            return f"W{self.plies}{mark}"
+        if self.outcome == LOSS:
+            return f"L{self.plies}{mark}"
+        if self.outcome == DRAW:
+            return "D"
+        return f"{self.estimate:+.1f}"
+
+
+def cell_value(score, search, exhaustive, complete):
+    """CellValue for a score seen from O's side one ply below the root
+
+    exhaustive says the search tried every move, complete that it also
+    reached the end of the game; only both together prove a draw.
+    """
+    if score >= search.decisive:
+        return CellValue(LOSS, search.win - score + 1, None, exhaustive)
+    if score <= -search.decisive:
+        return CellValue(WIN, search.win + score + 1, None, exhaustive)
+    if exhaustive and complete:
+        return CellValue(DRAW, None, None, True)
+    return CellValue(UNCLEAR, None, (search.draw - score) / search.horizon, False)
+
+
+class Analyzer:
+    """Values of X's moves, cached per position"""
+
+    def __init__(self, max_positions=4096):
+        self.max_positions = max_positions
+        self.cache = OrderedDict()
+        self.searches = {}
+
+    def search_for(self, geometry):
+        """This analyzer's standard-scoring search for a geometry"""
+        search = self.searches.get(geometry)
+        if search is None:
+            search = self.searches[geometry] = engine.new_searches(geometry)[0]
+        return search
+
+    def analyze(self, board):
+        """{cell: CellValue} for X's candidate moves on board"""
+        key = (board.geometry, board.x, board.o)
+        values = self.cache.get(key)
+        if values is not None:
+            self.cache.move_to_end(key)
+            return values
+
+        geometry = board.geometry
+        cells = board.empty_cells() if geometry.is_small else board.ordered_moves("X")
+        budget_ms = None if geometry == engine.CLASSIC else BUDGET_MS
+        table = engine.classic_table(geometry)
+        search = engine.STANDARD if table is not None else self.search_for(geometry)
+
+        board = board.copy()
+        values = {}
+        for cell in cells:
+            board.make(cell, "X")
+            if board.check_winner("X"):
+                values[cell] = CellValue(WIN, 1, None, True)
+            elif board.is_board_full():
+                values[cell] = CellValue(DRAW, None, None, True)
+            elif table is not None:
+                values[cell] = cell_value(table.standard_score(board), search, True, True)
+            else:
+                result = search.best_move(board, True, budget_ms)
+                complete = result.depth >= geometry.cells - board.moves
+                values[cell] = cell_value(result.score, search, geometry.is_small, complete)
+            board.unmake(cell, "X")
+
+        self.cache[key] = values
+        if len(self.cache) > self.max_positions:
+            self.cache.popitem(last=False)
+        return values
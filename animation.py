@@ -0,0 +1,158 @@
+"""One timer for every timed effect in the Tk window"""
+import heapq
+import itertools
+import time
+
+import metrics
+
+# Shortest gap between two ticks; updates due within a frame are merged
+FRAME_MS = 16
+
+
+class FrameScheduler:
+    """Runs timed callbacks and animations off a single root.after timer
+
+    after and after_cancel take the same arguments as Tk's, so anything
+    written against the root window (such as MoveWorker) can be handed a
+    scheduler instead. Widget changes made through update during a tick
+    are merged and applied with one config call per widget at the end of
+    the tick. cancel_all drops every pending callback and animation at
+    once, which is what a restart or screen change needs.
+    """
+
+    def __init__(self, root, frame_ms=FRAME_MS):
+        self.root = root
+        self.frame_ms = frame_ms
+        # Heap of (due time, sequence, handle); cancelled handles are
+        # skipped when they come up
+        self.queue = []
+        self.entries = {}
+        self.sequence = itertools.count()
+        self.timer = None
+        self.timer_due = None
+        # target -> merged options, flushed at the end of the tick
+        self.updates = {}
+        self.ticking = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def after(self, ms, callback, *args):
+        """Call callback(*args) in ms milliseconds; return a handle"""
+        handle = f"frame#{next(self.sequence)}"
+        self._push(handle, ms, callback, args)
+        return handle
+
+    def after_cancel(self, handle):
+        """Forget a pending callback or animation (unknown handles are ignored)"""
+        self.entries.pop(handle, None)
+        if not self.entries:
+            self._disarm()
+
+    def animate(self, frames, interval_ms, done=None):
+        """Apply one frame from frames every interval_ms; return a handle
+
+        Each frame is a list of (target, options) pairs, where a target is
+        a widget or a (canvas, item) pair. done() runs after the last frame
+        unless the animation is cancelled first.
+        """
+        frames = iter(frames)
+        handle = f"frame#{next(self.sequence)}"
+
+        def step():
+            frame = next(frames, None)
+            if frame is None:
+                if done is not None:
+                    done()
+                return
+            for target, options in frame:
+                self.update(target, **options)
+            self._push(handle, interval_ms, step, ())
+
+        self._push(handle, 0, step, ())
+        return handle
+
+    def update(self, target, **options):
+        """Change a widget or (canvas, item), merged with others this tick"""
+        if not self.ticking:
+            apply(target, options)
+            return
+        merged = self.updates.get(target)
+        if merged is None:
+            self.updates[target] = dict(options)
+        else:
+            merged.update(options)
+
+    def cancel_all(self):
+        """Drop every pending callback, animation and update"""
+        self.entries.clear()
+        self.queue.clear()
+        self.updates.clear()
+        self._disarm()
+
+    def _push(self, handle, ms, callback, args):
+        """(Re)schedule handle and make sure the timer fires in time"""
+        seq = next(self.sequence)
+        due = time.perf_counter() + ms / 1000
+        self.entries[handle] = (seq, callback, args)
+        heapq.heappush(self.queue, (due, seq, handle))
+        # Armed even mid-tick: a callback may open a modal dialog, whose
+        # nested event loop must keep running animations behind it
+        if self.timer_due is None or due < self.timer_due:
+            self._arm(due)
+
+    def _arm(self, due):
+        """Point the single Tk timer at due"""
+        self._disarm()
+        delay_ms = max(0, round((due - time.perf_counter()) * 1000))
+        self.timer_due = due
+        self.timer = self.root.after(delay_ms, self._tick)
+
+    def _disarm(self):
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+            self.timer = None
+            self.timer_due = None
+
+    @metrics.timed('tk.frame')
+    def _tick(self):
+        """Run everything that is due, then flush the merged updates
+
+        A tick can run inside another one, from a dialog's event loop
+        opened by a callback; the outer tick carries on afterwards.
+        """
+        self.timer = None
+        self.timer_due = None
+        outer = self.ticking
+        self.ticking = True
+        try:
+            now = time.perf_counter()
+            queue = self.queue
+            while queue and queue[0][0] <= now:
+                _, seq, handle = heapq.heappop(queue)
+                entry = self.entries.get(handle)
+                # Cancelled, or rescheduled under a newer sequence number
+                if entry is None or entry[0] != seq:
+                    continue
+                del self.entries[handle]
+                _, callback, args = entry
+                callback(*args)
+            updates, self.updates = self.updates, {}
+            for target, options in updates.items():
+                apply(target, options)
+        finally:
+            self.ticking = outer
+            # Drop stale heap entries so the timer only wakes for live ones
+            while queue and self.entries.get(queue[0][2], (None,))[0] != queue[0][1]:
+                heapq.heappop(queue)
+            if queue:
+                self._arm(max(queue[0][0], now + self.frame_ms / 1000))
+
+
+def apply(target, options):
+    """Configure a widget, or an item when target is (canvas, item)"""
+    if isinstance(target, tuple):
+        canvas, item = target
+        canvas.itemconfig(item, **options)
+    else:
+        target.config(**options)
@@ -0,0 +1,243 @@
+"""Benchmarks for the board primitives and the computer strategies
+
+Runs headlessly over a fixed corpus of positions and records ns per
+call for the board primitives, plus nodes per move, ns per node and
+p50/p99 move latency for the searches and Medium. It also times a fresh
+`xo.py play` process up to the computer's first move. Results can be
+saved as a JSON baseline; later runs fail when any metric gets worse
+than the baseline by more than the threshold, or when the cold start
+misses COLD_START_TARGET_MS.
+
+    python bench.py --save           # record bench_baseline.json
+    python bench.py                  # compare against it, exit 1 on regression
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+import engine
+from engine import BOARD_SIZES, Board, Geometry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+XO = os.path.join(HERE, "xo.py")
+
+# A fresh process must show the computer's first move within this
+COLD_START_TARGET_MS = 250
+COLD_START = "cold start / xo.py play Hard"
+
+# (name, board size, moves played so far with X first, search depth cap)
+CORPUS = [
+    ("3x3 empty", "3x3", [], None),
+    ("3x3 opening", "3x3", [4], None),
+    ("3x3 corner opening", "3x3", [0], None),
+    ("3x3 midgame", "3x3", [4, 0, 8], None),
+    ("3x3 fork threat", "3x3", [0, 4, 8], None),
+    ("3x3 near terminal", "3x3", [0, 4, 8, 2, 6], None),
+    ("5x5 midgame", "5x5", [12, 6, 13, 7, 11], 4),
+    ("7x7 midgame", "7x7", [24, 16, 25, 17, 23], 3),
+    ("15x15 opening", "15x15", [112], 3),
+    ("15x15 midgame", "15x15", [112, 96, 113, 97, 111], 3),
+    ("4x4x4 midgame", "4x4x4", [21, 42, 22, 41, 25, 0], 3),
+]
+
+
+def corpus_board(size, moves):
+    """Replay a corpus entry onto a fresh board"""
+    board = Board(geometry=Geometry(*BOARD_SIZES[size]))
+    for i, cell in enumerate(moves):
+        board.make(cell, "XO"[i % 2])
+    return board
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Each latency sample times enough calls back to back to span at least
+# this long, so microsecond calls sit far above the timer's resolution
+SAMPLE_S = 0.002
+
+
+def calls_per_sample(call):
+    """How many calls of call one latency sample should time"""
+    start = time.perf_counter()
+    call()
+    elapsed = time.perf_counter() - start
+    return max(1, min(10_000, math.ceil(SAMPLE_S / max(elapsed, 1e-9))))
+
+
+def ns_per_call(statement, repeat):
+    """Best-of-repeat nanoseconds for one call of statement"""
+    timer = timeit.Timer(statement)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def bench_primitives(board, repeat):
+    """ns per call of the board primitives on one position"""
+    cell = board.empty_cells()[0]
+    player = board.to_move()
+
+    def make_unmake():
+        board.make(cell, player)
+        board.unmake(cell, player)
+
+    return {
+        'check_winner_ns': ns_per_call(lambda: board.check_winner("X"), repeat),
+        'is_board_full_ns': ns_per_call(board.is_board_full, repeat),
+        'make_unmake_ns': ns_per_call(make_unmake, repeat),
+    }
+
+
+def bench_search(board, scoring, max_depth, repeat):
+    """Nodes, ns/node and latency of a cold-table search from one position"""
+    is_maximizing = board.to_move() == "O"
+
+    def cold_search():
+        return engine.new_searches(board.geometry)[scoring]
+
+    def search_once(search):
+        return search.best_move(board, is_maximizing, max_depth=max_depth)
+
+    number = calls_per_sample(lambda: search_once(cold_search()))
+    latencies = []
+    nodes = None
+    for _ in range(repeat):
+        # Every call gets a cold table, built outside the timed loop
+        searches = [cold_search() for _ in range(number)]
+        start = time.perf_counter()
+        for search in searches:
+            result = search_once(search)
+        latencies.append((time.perf_counter() - start) / number)
+        nodes = result.nodes
+    return {
+        'nodes_per_move': nodes,
+        # Best run, since scheduler noise only ever adds time
+        'ns_per_node': min(latencies) / max(nodes, 1) * 1e9,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_medium(board, repeat):
+    """Latency of Medium's win/block/random choice"""
+    random.seed(0)
+    number = calls_per_sample(lambda: engine.medium_move(board))
+    latencies = []
+    for _ in range(repeat * 10):
+        start = time.perf_counter()
+        for _ in range(number):
+            engine.medium_move(board)
+        latencies.append((time.perf_counter() - start) / number)
+    return {
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_cold_start(repeat):
+    """Wall time from launching `xo.py play` to the computer's first move
+
+    The scripted player takes the center and quits after the reply, so
+    a run covers interpreter start, imports, mapping the table (if it
+    exists) and one Hard move.
+    """
+    env = dict(os.environ, XO_GAME_LOG="")
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, XO, "play", "--level", "Hard"],
+                       input="2 2\nq\n", capture_output=True, text=True,
+                       env=env, check=True)
+        latencies.append(time.perf_counter() - start)
+    return {
+        'best_ms': min(latencies) * 1000,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+    }
+
+
+def run(repeat=5):
+    """Run the whole suite; return {benchmark name: {metric: value}}"""
+    results = {}
+    for name, size, moves, max_depth in CORPUS:
+        board = corpus_board(size, moves)
+        results[f"{name} / primitives"] = bench_primitives(board, repeat)
+        results[f"{name} / minimax"] = bench_search(board, 0, max_depth, repeat)
+        results[f"{name} / killer_minimax"] = bench_search(board, 1, max_depth, repeat)
+        results[f"{name} / medium_move"] = bench_medium(board, repeat)
+    results[COLD_START] = bench_cold_start(repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """List (benchmark, metric, baseline, current) that got worse than allowed
+
+    The test is purely relative, so a metric measured in microseconds is
+    held to the same threshold as one measured in seconds. Timing calls
+    in batches (see SAMPLE_S) keeps the small ones out of timer noise.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if base is None:
+                continue
+            if value > base * (1 + threshold):
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="JSON baseline to compare against or save to")
+    parser.add_argument('--save', action='store_true',
+                        help="write this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.3,
+                        help="allowed slowdown before failing (0.3 = 30%%)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    for name, metrics in results.items():
+        shown = "  ".join(f"{metric}={value:,.4g}" for metric, value in metrics.items())
+        print(f"{name:<40} {shown}")
+    slow_start = results[COLD_START]['best_ms'] > COLD_START_TARGET_MS
+    if slow_start:
+        print(f"SLOW START {results[COLD_START]['best_ms']:,.4g} ms, "
+              f"target {COLD_START_TARGET_MS} ms")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 1 if slow_start else 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save to record one")
+        return 1 if slow_start else 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for name, metric, base, value in regressions:
+        print(f"REGRESSION {name} {metric}: {base:,.4g} -> {value:,.4g}")
+    print(f"{len(regressions)} regressions past {args.threshold:.0%}")
+    return 1 if regressions or slow_start else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Exhaustive check of the alpha-beta search against plain minimax
+
+Compares engine.STANDARD.value and engine.KILLER.value with a textbook
+minimax (no pruning, move ordering, threat lines or transposition
+table) on every legal 3x3 position. The pruned search and its table
+are only worth having if they give the same value everywhere.
+
+    python check_exact.py
+    python check_exact.py --quiet    # only print the summary
+
+Exits with status 1 on any mismatch, so it can run as a regression
+check next to verify_impossible.py whenever the search changes.
+"""
+import argparse
+import sys
+import time
+
+import engine
+from engine import CLASSIC
+from perfect_play import legal_positions
+
+
+def won(bits):
+    """True if bits cover a whole line"""
+    return any(bits & mask == mask for mask in CLASSIC.masks)
+
+
+def minimax(search, x, o, is_maximizing, ply, memo):
+    """Score of a position ply plies below the root, scored like search
+
+    O wins score search.win - ply, X wins ply - search.win and full
+    boards search.draw, as in Search.terminal.
+    """
+    if won(o):
+        return search.win - ply
+    if won(x):
+        return ply - search.win
+    if x | o == CLASSIC.full_mask:
+        return search.draw
+    key = (x, o, ply)
+    if key in memo:
+        return memo[key]
+    free = CLASSIC.full_mask & ~(x | o)
+    if is_maximizing:
+        score = max(minimax(search, x, o | 1 << cell, False, ply + 1, memo)
+                    for cell in range(CLASSIC.cells) if free >> cell & 1)
+    else:
+        score = min(minimax(search, x | 1 << cell, o, True, ply + 1, memo)
+                    for cell in range(CLASSIC.cells) if free >> cell & 1)
+    memo[key] = score
+    return score
+
+
+def check(quiet=False):
+    """Compare both searches on every legal position; return (positions, mismatches)"""
+    searches = (("standard", engine.STANDARD, {}), ("killer", engine.KILLER, {}))
+    positions = mismatches = 0
+    for index, x, o in legal_positions():
+        is_maximizing = bin(x).count("1") > bin(o).count("1")
+        positions += 1
+        for name, search, memo in searches:
+            expected = minimax(search, x, o, is_maximizing, 0, memo)
+            found = search.value(x, o, is_maximizing)
+            if found != expected:
+                mismatches += 1
+                if not quiet:
+                    print(f"{name} position {index}: search {found}, minimax {expected}")
+    return positions, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quiet', action='store_true', help="only print the summary")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    positions, mismatches = check(args.quiet)
+    elapsed = time.perf_counter() - start
+    print(f"{mismatches} mismatches in {positions:,} positions "
+          f"(standard and killer) in {elapsed:.2f}s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,914 @@
+"""Headless XO engine - bitboard game state and computer strategies"""
+import math
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import metrics
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, canonical_key
+
+# Boards up to this many cells search every free cell in a fixed order;
+# larger ones only look near existing marks and keep the best BEAM_WIDTH
+SMALL_BOARD_CELLS = 16
+BEAM_WIDTH = 12
+
+# Line directions as (layer, row, col) steps: the four within a layer,
+# then the nine that also move to the next layer on a 3D board
+DIRECTIONS = ((0, 0, 1), (0, 1, 0), (0, 1, 1), (0, 1, -1)) + tuple(
+    (1, dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1))
+
+
+class Geometry:
+    """Board shape: rows x cols cells, k marks in a row to win
+
+    With layers > 1 the board is a stack of rows x cols layers (4x4x4 is
+    Qubic), and lines also run through the layers. Cells are numbered
+    layer by layer, so rows simply carry on into the next layer: row
+    rows is the first row of the second layer.
+    """
+
+    def __init__(self, rows=3, cols=3, k=3, layers=1):
+        if not 2 <= k <= max(rows, cols, layers):
+            raise ValueError(f"Cannot get {k} in a row on a {rows}x{cols} board")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.layers = layers
+        self.layer_cells = rows * cols
+        self.cells = layers * self.layer_cells
+        self.full_mask = (1 << self.cells) - 1
+        self.cell_bits = tuple(1 << cell for cell in range(self.cells))
+
+        # Every run of k cells along a row, column or diagonal
+        lines = []
+        for l in range(layers):
+            for r in range(rows):
+                for c in range(cols):
+                    for dl, dr, dc in DIRECTIONS:
+                        end_l, end_r, end_c = l + dl * (k - 1), r + dr * (k - 1), c + dc * (k - 1)
+                        if 0 <= end_l < layers and 0 <= end_r < rows and 0 <= end_c < cols:
+                            lines.append(tuple((l + dl * i) * self.layer_cells
+                                               + (r + dr * i) * cols + c + dc * i
+                                               for i in range(k)))
+        self.lines = tuple(lines)
+        self.masks = tuple(sum(1 << cell for cell in line) for line in lines)
+        # Indexes of the lines through each cell, so a move only
+        # touches its own lines
+        self.cell_lines = tuple(tuple(i for i, line in enumerate(lines) if cell in line)
+                                for cell in range(self.cells))
+        # Cells sharing a line with each cell, for 3D neighborhoods
+        reach = []
+        for cell_lines in self.cell_lines:
+            mask = 0
+            for line in cell_lines:
+                mask |= self.masks[line]
+            reach.append(mask)
+        self.cell_reach = tuple(reach)
+
+        # Column masks for shifting marks sideways without wrapping rows
+        first_col = sum(1 << (r * cols) for r in range(layers * rows))
+        last_col = first_col << (cols - 1)
+        self.not_first_col = self.full_mask & ~first_col
+        self.not_last_col = self.full_mask & ~last_col
+
+        # Quiet moves: closest to the center first, diagonals before edges
+        center_l, center_r, center_c = (layers - 1) / 2, (rows - 1) / 2, (cols - 1) / 2
+
+        def centrality(cell):
+            l, rest = divmod(cell, self.layer_cells)
+            r, c = divmod(rest, cols)
+            dl, dr, dc = abs(l - center_l), abs(r - center_r), abs(c - center_c)
+            return (max(dl, dr, dc), -(dl + dr + dc), cell)
+
+        self.static_order = tuple(1 << cell for cell in
+                                  sorted(range(self.cells), key=centrality))
+
+        # Evaluation weight of a line holding n marks of a single player
+        self.weights = tuple(0 if n == 0 else 10 ** n for n in range(k + 1))
+
+        # Winning cells for every player board on tiny boards
+        self.threat_table = None
+        if self.cells <= 9:
+            self.threat_table = tuple(self._scan_threats(bits)
+                                      for bits in range(1 << self.cells))
+
+    def __eq__(self, other):
+        return (isinstance(other, Geometry) and
+                (self.rows, self.cols, self.k, self.layers)
+                == (other.rows, other.cols, other.k, other.layers))
+
+    def __hash__(self):
+        return hash((self.rows, self.cols, self.k, self.layers))
+
+    def __repr__(self):
+        if self.layers > 1:
+            return f"Geometry({self.rows}, {self.cols}, {self.k}, {self.layers})"
+        return f"Geometry({self.rows}, {self.cols}, {self.k})"
+
+    @property
+    def name(self):
+        """Size as written in BOARD_SIZES, e.g. 7x7 or 4x4x4"""
+        if self.layers > 1:
+            return f"{self.layers}x{self.rows}x{self.cols}"
+        return f"{self.rows}x{self.cols}"
+
+    @property
+    def is_small(self):
+        """Small boards search every free cell"""
+        return self.cells <= SMALL_BOARD_CELLS
+
+    def cell_index(self, row, col):
+        """Convert a (row, col) pair into a cell index (rows run on through the layers)"""
+        return row * self.cols + col
+
+    def cell_coords(self, cell):
+        """Convert a cell index into a (row, col) pair (rows run on through the layers)"""
+        return divmod(cell, self.cols)
+
+    def has_won(self, bits):
+        """Check if a player bitboard covers any winning line"""
+        for mask in self.masks:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def _scan_threats(self, bits):
+        """Cells completing a line for bits on an otherwise empty board"""
+        threats = 0
+        for mask in self.masks:
+            missing = mask & ~bits
+            if missing and not missing & (missing - 1):
+                threats |= missing
+        return threats
+
+    def neighborhood(self, occupied):
+        """Free cells next to any mark (the center on an empty board)"""
+        if not occupied:
+            return self.static_order[0]
+        if self.layers > 1:
+            # Diagonals through the layers make any cell on a line with
+            # a mark a neighbor
+            near = 0
+            reach = self.cell_reach
+            marks = occupied
+            while marks:
+                bit = marks & -marks
+                marks ^= bit
+                near |= reach[bit.bit_length() - 1]
+            return near & ~occupied
+        cols = self.cols
+        row = (occupied | (occupied << 1) & self.not_first_col
+               | (occupied >> 1) & self.not_last_col)
+        near = row | (row << cols) | (row >> cols)
+        return near & self.full_mask & ~occupied
+
+
+# The original 3x3 game
+CLASSIC = Geometry(3, 3, 3)
+
+SIZE = CLASSIC.rows
+CELLS = CLASSIC.cells
+FULL_MASK = CLASSIC.full_mask
+WIN_LINES = CLASSIC.lines
+WIN_MASKS = CLASSIC.masks
+
+# Board sizes offered in the game, as (rows, cols, k in a row)
+BOARD_SIZES = {
+    "3x3": (3, 3, 3),
+    "4x4": (4, 4, 4),
+    "5x5": (5, 5, 4),
+    "7x7": (7, 7, 5),
+    "10x10": (10, 10, 5),
+    "15x15": (15, 15, 5),
+    # Qubic: four stacked 4x4 layers, 76 lines of four
+    "4x4x4": (4, 4, 4, 4),
+}
+
+# Geometry of each board size, built on first use
+_geometries = {"3x3": CLASSIC}
+
+
+def geometry_for(size):
+    """Return the shared Geometry for a BOARD_SIZES name"""
+    geometry = _geometries.get(size)
+    if geometry is None:
+        geometry = _geometries[size] = Geometry(*BOARD_SIZES[size])
+    return geometry
+
+
+class Position:
+    """Read-only queries shared by Board and gamestate.GameState
+
+    Subclasses provide geometry, the x and o bitboards, and
+    completed_lines(player), the indexes of the lines player has filled.
+    """
+
+    __slots__ = ()
+
+    def get(self, cell):
+        """Return "X", "O" or "" for the given cell"""
+        bit = 1 << cell
+        if self.x & bit:
+            return "X"
+        if self.o & bit:
+            return "O"
+        return ""
+
+    def is_empty(self, cell):
+        """Check if a cell is free"""
+        return not (self.x | self.o) & (1 << cell)
+
+    def empty_cells(self):
+        """List the free cells in row-major order"""
+        occupied = self.x | self.o
+        return [cell for cell in range(self.geometry.cells) if not occupied & (1 << cell)]
+
+    def to_move(self):
+        """Return the player whose turn it is (X always starts)"""
+        return "X" if self.x.bit_count() == self.o.bit_count() else "O"
+
+    def check_winner(self, player):
+        """Check if the specified player has won"""
+        return bool(self.completed_lines(player))
+
+    def is_board_full(self):
+        """Check if the board is completely filled"""
+        return self.x | self.o == self.geometry.full_mask
+
+    def player_won(self, level):
+        """Check if X has won a game played at level
+
+        The player never wins Impossible mode; the game just carries on.
+        """
+        return level != 'Impossible' and self.check_winner("X")
+
+    def winning_cells(self, player):
+        """All cells on the lines player has completed"""
+        lines = self.geometry.lines
+        return sorted({cell for line in self.completed_lines(player) for cell in lines[line]})
+
+    def is_winning_cell(self, cell, player):
+        """Check if a cell is part of the winning combination"""
+        return cell in self.winning_cells(player)
+
+
+class Board(Position):
+    """Board stored as two integer bitboards plus per-line counters
+
+    make and unmake keep, for every line, how many marks each player has
+    on it, so wins, draws, threats and the evaluation are all updated
+    from the lines through the last cell instead of rescanning the board.
+    """
+
+    def __init__(self, x=0, o=0, geometry=CLASSIC):
+        self.geometry = geometry
+        self.x = 0
+        self.o = 0
+        self.moves = 0
+        line_count = len(geometry.lines)
+        self.line_counts = {"X": [0] * line_count, "O": [0] * line_count}
+        # Open lines one mark short of a win, and completed lines
+        self.threat_lines = {"X": set(), "O": set()}
+        self.complete_lines = {"X": set(), "O": set()}
+        # Running total of the line-weighted evaluation, positive favors O
+        self.balance = 0
+        for cell in range(geometry.cells):
+            if x >> cell & 1:
+                self.make(cell, "X")
+            elif o >> cell & 1:
+                self.make(cell, "O")
+
+    def copy(self):
+        """Return an independent copy of the board"""
+        board = Board.__new__(Board)
+        board.geometry = self.geometry
+        board.x = self.x
+        board.o = self.o
+        board.moves = self.moves
+        board.line_counts = {p: counts[:] for p, counts in self.line_counts.items()}
+        board.threat_lines = {p: set(lines) for p, lines in self.threat_lines.items()}
+        board.complete_lines = {p: set(lines) for p, lines in self.complete_lines.items()}
+        board.balance = self.balance
+        return board
+
+    def make(self, cell, player):
+        """Place a mark for player on cell; return the line it completes, if any"""
+        geometry = self.geometry
+        if player == "X":
+            self.x |= 1 << cell
+            other, sign = "O", -1
+        else:
+            self.o |= 1 << cell
+            other, sign = "X", 1
+        self.moves += 1
+
+        k = geometry.k
+        weights = geometry.weights
+        mine = self.line_counts[player]
+        theirs = self.line_counts[other]
+        completed = None
+        for line in geometry.cell_lines[cell]:
+            count = mine[line] + 1
+            mine[line] = count
+            if not theirs[line]:
+                # Still an open line for us
+                self.balance += sign * (weights[count] - weights[count - 1])
+                if count == k - 1:
+                    self.threat_lines[player].add(line)
+                elif count == k:
+                    self.threat_lines[player].discard(line)
+                    self.complete_lines[player].add(line)
+                    completed = geometry.lines[line]
+            elif count == 1:
+                # Our first mark kills a line that was open for them
+                self.balance += sign * weights[theirs[line]]
+                self.threat_lines[other].discard(line)
+        return completed
+
+    def unmake(self, cell, player):
+        """Take back a mark placed with make"""
+        geometry = self.geometry
+        if player == "X":
+            self.x &= ~(1 << cell)
+            other, sign = "O", -1
+        else:
+            self.o &= ~(1 << cell)
+            other, sign = "X", 1
+        self.moves -= 1
+
+        k = geometry.k
+        weights = geometry.weights
+        mine = self.line_counts[player]
+        theirs = self.line_counts[other]
+        for line in geometry.cell_lines[cell]:
+            count = mine[line]
+            mine[line] = count - 1
+            if not theirs[line]:
+                self.balance -= sign * (weights[count] - weights[count - 1])
+                if count == k - 1:
+                    self.threat_lines[player].discard(line)
+                elif count == k:
+                    self.complete_lines[player].discard(line)
+                    self.threat_lines[player].add(line)
+            elif count == 1:
+                self.balance -= sign * weights[theirs[line]]
+                if theirs[line] == k - 1:
+                    self.threat_lines[other].add(line)
+
+    def completed_lines(self, player):
+        """Set of the indexes of the lines player has filled"""
+        return self.complete_lines[player]
+
+    # check_winner and is_board_full run at every search node, so the
+    # board answers them straight from its counters
+
+    def check_winner(self, player):
+        """Check if the specified player has won"""
+        return bool(self.complete_lines[player])
+
+    def is_board_full(self):
+        """Check if the board is completely filled"""
+        return self.moves == self.geometry.cells
+
+    def threat_cells(self, player):
+        """Mask of free cells where player would complete a line"""
+        geometry = self.geometry
+        occupied = self.x | self.o
+        if geometry.threat_table is not None:
+            return geometry.threat_table[self.x if player == "X" else self.o] & ~occupied
+        masks = geometry.masks
+        threats = 0
+        for line in self.threat_lines[player]:
+            threats |= masks[line]
+        return threats & ~occupied
+
+    def cell_score(self, cell, player):
+        """How much a mark on cell builds player's lines and breaks the opponent's"""
+        geometry = self.geometry
+        weights = geometry.weights
+        mine = self.line_counts[player]
+        theirs = self.line_counts["O" if player == "X" else "X"]
+        score = 0
+        for line in geometry.cell_lines[cell]:
+            if not theirs[line]:
+                score += weights[mine[line] + 1]
+            if not mine[line]:
+                score += weights[theirs[line]]
+        return score
+
+    def ordered_moves(self, player):
+        """Candidate cells: wins, blocks, then the most promising quiet moves"""
+        geometry = self.geometry
+        occupied = self.x | self.o
+        wins = self.threat_cells(player)
+        blocks = self.threat_cells("O" if player == "X" else "X") & ~wins
+        urgent = wins | blocks
+        moves = [cell for cell in range(geometry.cells) if wins >> cell & 1]
+        moves += [cell for cell in range(geometry.cells) if blocks >> cell & 1]
+        if geometry.is_small:
+            free = ~occupied & geometry.full_mask & ~urgent
+            moves += [bit.bit_length() - 1 for bit in geometry.static_order if free & bit]
+            return moves
+
+        quiet = geometry.neighborhood(occupied) & ~urgent
+        scored = []
+        while quiet:
+            bit = quiet & -quiet
+            quiet ^= bit
+            cell = bit.bit_length() - 1
+            scored.append((-self.cell_score(cell, player), cell))
+        scored.sort()
+        moves += [cell for _, cell in scored[:max(0, BEAM_WIDTH - len(moves))]]
+        return moves
+
+
+def random_move(board):
+    """Easy mode - Random move"""
+    empty_cells = board.empty_cells()
+    return random.choice(empty_cells) if empty_cells else None
+
+
+def find_winning_cell(board, player):
+    """Return a cell that completes a line for player, or None"""
+    wins = board.threat_cells(player)
+    if not wins:
+        return None
+    # Lowest set bit, i.e. the first winning cell in row-major order
+    return (wins & -wins).bit_length() - 1
+
+
+# How often Medium notices that the player is about to win
+MEDIUM_BLOCK_CHANCE = 0.7
+
+
+def medium_move(board):
+    """Medium mode - Win if possible, block sometimes, else random"""
+    # Try to win first
+    move = find_winning_cell(board, "O")
+    if move is not None:
+        return move
+
+    # Try to block player (70% chance)
+    if random.random() < MEDIUM_BLOCK_CHANCE:
+        move = find_winning_cell(board, "X")
+        if move is not None:
+            return move
+
+    # Random move
+    return random_move(board)
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time budget runs out"""
+
+
+class SearchCancelled(Exception):
+    """Raised inside a search whose cancel token has been cancelled"""
+
+
+class CancelToken:
+    """Stops the searches started under it (see cancel_scope) once cancelled
+
+    Each caller that may want to stop its searches, such as a MoveWorker,
+    uses its own token, so cancelling one never stops another's search.
+    """
+
+    __slots__ = ('cancelled',)
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        """Ask the searches under this token, on any thread, to stop soon"""
+        self.cancelled = True
+
+
+# Token for searches started outside any cancel_scope; never cancelled
+NEVER = CancelToken()
+_scope = threading.local()
+
+
+@contextmanager
+def cancel_scope(token):
+    """Run the searches started in this block, on this thread, under token"""
+    previous = current_token()
+    _scope.token = token
+    try:
+        yield token
+    finally:
+        _scope.token = previous
+
+
+def current_token():
+    """Cancel token for searches started now on this thread"""
+    return getattr(_scope, 'token', NEVER)
+
+
+class SearchResult(namedtuple('SearchResult',
+                              'move score depth nodes elapsed_ms iteration_nodes')):
+    """Outcome of an iterative deepening search from the root"""
+
+    @property
+    def branching_factor(self):
+        """Effective branching factor of the deepest completed iteration,
+        or 0.0 if no iteration completed
+        """
+        if not self.depth:
+            return 0.0
+        return self.iteration_nodes[-1] ** (1 / self.depth)
+
+
+class Search:
+    """Alpha-beta minimax with fixed terminal scores, a node counter and a cache"""
+
+    def __init__(self, win, draw, table=None, geometry=CLASSIC):
+        self.win = win
+        self.draw = draw
+        self.table = table
+        self.geometry = geometry
+        self.nodes = 0
+        self.deadline = None
+        self.token = NEVER
+        # Scores at or beyond this are forced wins/losses, which lose
+        # one point per ply so faster wins are preferred
+        self.decisive = win - geometry.cells
+        # Horizon estimates stay strictly inside the forced-result range
+        self.horizon = (self.decisive - abs(draw)) * 0.9
+        # The 3x3 board folds its 8 symmetries into one key
+        self.key = canonical_key if geometry == CLASSIC else self.raw_key
+
+    def raw_key(self, x, o, is_maximizing):
+        """Table key for boards without symmetry folding"""
+        return (((x << self.geometry.cells) | o) << 1) | is_maximizing
+
+    def to_table(self, score, ply):
+        """Make a forced win/loss score relative to the node being stored"""
+        if score >= self.decisive:
+            return score + ply
+        if score <= -self.decisive:
+            return score - ply
+        return score
+
+    def from_table(self, score, ply):
+        """Undo to_table for a node found ply plies below the root"""
+        if score >= self.decisive:
+            return score - ply
+        if score <= -self.decisive:
+            return score + ply
+        return score
+
+    def evaluate(self, board):
+        """Horizon estimate from open lines, kept below any forced result"""
+        raw = board.balance
+        scale = self.geometry.weights[-2]
+        return self.draw + self.horizon * raw / (abs(raw) + scale)
+
+    def terminal(self, board, ply):
+        """Score of a finished position ply plies below the root, else None"""
+        if board.check_winner("O"):
+            return self.win - ply
+        if board.check_winner("X"):
+            return ply - self.win
+        if board.is_board_full():
+            return self.draw
+        return None
+
+    def alphabeta(self, board, is_maximizing, ply, depth, alpha, beta):
+        """Score of an unfinished position ply plies below the root
+
+        Wins are spotted one ply early through the threat lines, so the
+        position itself must not be won already; see terminal.
+        """
+        self.nodes += 1
+        if not self.nodes & 63:
+            if self.token.cancelled:
+                raise SearchCancelled
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchTimeout
+        cells = self.geometry.cells
+        if board.moves == cells:
+            return self.draw
+
+        player, other = ("O", "X") if is_maximizing else ("X", "O")
+        sign = 1 if is_maximizing else -1
+        # Winning on the spot beats anything else
+        if board.threat_cells(player):
+            return sign * (self.win - ply - 1)
+        # Two open threats cannot both be blocked
+        blocks = board.threat_cells(other)
+        if blocks & (blocks - 1):
+            return sign * (ply + 2 - self.win)
+
+        depth = min(depth, cells - board.moves)
+        if depth <= 0:
+            return self.evaluate(board)
+
+        table = self.table
+        if table is not None:
+            key = self.key(board.x, board.o, is_maximizing)
+            entry = table.probe(key, depth)
+            if entry is not None:
+                score, _, bound = entry
+                score = self.from_table(score, ply)
+                if bound == EXACT:
+                    return score
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+        original_alpha, original_beta = alpha, beta
+
+        # A single threat leaves blocking as the only move worth trying
+        if blocks:
+            moves = [blocks.bit_length() - 1]
+        else:
+            moves = board.ordered_moves(player)
+        best_score = -math.inf if is_maximizing else math.inf
+        for cell in moves:
+            board.make(cell, player)
+            score = self.alphabeta(board, not is_maximizing, ply + 1, depth - 1, alpha, beta)
+            board.unmake(cell, player)
+            if is_maximizing:
+                if score > best_score:
+                    best_score = score
+                    alpha = max(alpha, score)
+            elif score < best_score:
+                best_score = score
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+
+        if table is not None:
+            if best_score <= original_alpha:
+                bound = UPPER
+            elif best_score >= original_beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, self.to_table(best_score, ply), depth, bound)
+        return best_score
+
+    def score(self, board, depth, is_maximizing):
+        """Exact minimax score of board as seen from depth plies above it"""
+        score = self.terminal(board, depth)
+        if score is not None:
+            return score
+        self.token = current_token()
+        # Search a private copy so a timeout never leaves marks behind
+        return self.alphabeta(board.copy(), is_maximizing, depth,
+                              self.geometry.cells, -math.inf, math.inf)
+
+    def value(self, x, o, is_maximizing):
+        """Exact minimax value of a position relative to the position itself"""
+        return self.score(Board(x, o, self.geometry), 0, is_maximizing)
+
+    def root(self, board, is_maximizing, depth, moves):
+        """Search every root move to depth; return (best move, score)"""
+        player = "O" if is_maximizing else "X"
+        alpha, beta = -math.inf, math.inf
+        best_cell = moves[0]
+        best_score = -math.inf if is_maximizing else math.inf
+        for cell in moves:
+            board.make(cell, player)
+            score = self.terminal(board, 1)
+            if score is None:
+                score = self.alphabeta(board, not is_maximizing, 1, depth - 1, alpha, beta)
+            board.unmake(cell, player)
+            if is_maximizing and score > best_score:
+                best_cell, best_score = cell, score
+                alpha = max(alpha, score)
+            elif not is_maximizing and score < best_score:
+                best_cell, best_score = cell, score
+                beta = min(beta, score)
+        return best_cell, best_score
+
+    def best_move(self, board, is_maximizing=True, budget_ms=None, max_depth=None):
+        """Iterative deepening alpha-beta within budget_ms (None for no limit)
+
+        max_depth caps the iterations, which gives repeatable node counts
+        on boards too large to search to the end.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.token = current_token()
+        if board.is_board_full():
+            return SearchResult(None, self.draw, 0, 0, 0.0, [0])
+        board = board.copy()
+        moves = board.ordered_moves("O" if is_maximizing else "X")
+        # Play on in an already decided game without searching
+        score = self.terminal(board, 0)
+        if score is not None:
+            return SearchResult(moves[0], score, 0, 0, 0.0, [0])
+
+        best = None
+        iteration_nodes = []
+        try:
+            last_depth = self.geometry.cells - board.moves
+            if max_depth is not None:
+                last_depth = min(last_depth, max_depth)
+            for depth in range(1, last_depth + 1):
+                nodes_before = self.nodes
+                cell, score = self.root(board, is_maximizing, depth, moves)
+                iteration_nodes.append(self.nodes - nodes_before)
+                best = (cell, score, depth)
+                # Try the previous best move first on the next iteration
+                moves.remove(cell)
+                moves.insert(0, cell)
+                # A forced result cannot improve with more depth
+                if abs(score) >= self.decisive:
+                    break
+                # The first iteration always completes so there is an answer
+                if budget_ms is not None:
+                    self.deadline = start + budget_ms / 1000
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+
+        cell, score, depth = best
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if metrics.enabled:
+            metrics.count('search.moves')
+            metrics.count('search.nodes', self.nodes)
+        return SearchResult(cell, score, depth, self.nodes, elapsed_ms, iteration_nodes)
+
+
+# Hard mode scoring: +/-10 for a win or loss, 0 for a draw
+STANDARD = Search(10, 0, TranspositionTable())
+# Impossible mode scoring: huge reward for winning, huge penalty for
+# losing, and a penalty for draws - we want to WIN!
+KILLER = Search(1000, -50, TranspositionTable())
+
+# Search pairs for the other board sizes, built on first use
+_searches = {CLASSIC: (STANDARD, KILLER)}
+
+
+def new_searches(geometry):
+    """Build a fresh (standard, killer) search pair with empty tables"""
+    if geometry == CLASSIC:
+        standard_win = 10
+        killer_win = 1000
+    else:
+        # Wins must outscore any depth, leaving room for horizon estimates
+        standard_win = killer_win = geometry.cells + 1000
+    return (Search(standard_win, 0, TranspositionTable(), geometry),
+            Search(killer_win, -50, TranspositionTable(), geometry))
+
+
+def searches_for(geometry):
+    """Return the shared (standard, killer) searches for a board geometry"""
+    pair = _searches.get(geometry)
+    if pair is None:
+        pair = _searches[geometry] = new_searches(geometry)
+    return pair
+
+
+def table_stats():
+    """Transposition table counters of every shared search, for metrics"""
+    return {f"{geometry.name} {name}": search.table.stats()
+            for geometry, pair in _searches.items()
+            for name, search in zip(("standard", "killer"), pair)}
+
+
+metrics.add_source('transposition', table_stats)
+
+
+# Per-move time budget so the computer always answers promptly
+MOVE_BUDGET_MS = 500
+
+
+def minimax(board, depth, is_maximizing):
+    """Standard minimax algorithm for Hard mode"""
+    return searches_for(board.geometry)[0].score(board, depth, is_maximizing)
+
+
+def search_best_move(board, budget_ms=MOVE_BUDGET_MS):
+    """Hard mode move found by searching with minimax"""
+    return searches_for(board.geometry)[0].best_move(board, True, budget_ms).move
+
+
+def killer_minimax(board, depth, is_maximizing):
+    """Enhanced minimax that heavily penalizes draws and favors wins"""
+    return searches_for(board.geometry)[1].score(board, depth, is_maximizing)
+
+
+def get_killer_move(board, budget_ms=MOVE_BUDGET_MS):
+    """Enhanced minimax for Impossible mode"""
+    return searches_for(board.geometry)[1].best_move(board, True, budget_ms).move
+
+
+def search_impossible_move(board, budget_ms=MOVE_BUDGET_MS):
+    """Impossible mode move found by the win/block/killer search"""
+    # First priority: Win immediately if possible
+    move = find_winning_cell(board, "O")
+    if move is not None:
+        return move
+
+    # Second priority: Block player from winning
+    move = find_winning_cell(board, "X")
+    if move is not None:
+        return move
+
+    # Third priority: Use enhanced minimax
+    return get_killer_move(board, budget_ms)
+
+
+def best_move(board):
+    """Hard mode - Optimal minimax strategy"""
+    table = classic_table(board.geometry)
+    if table is not None:
+        if metrics.enabled:
+            metrics.count('perfect_table.lookups')
+        return table.hard_move(board)
+    return search_best_move(board)
+
+
+def impossible_move(board):
+    """Impossible mode - Win, then block, then enhanced minimax"""
+    table = classic_table(board.geometry)
+    if table is not None:
+        if metrics.enabled:
+            metrics.count('perfect_table.lookups')
+        return table.impossible_move(board)
+    return search_impossible_move(board)
+
+
+def master_move(board):
+    """Master mode - Monte Carlo tree search, for boards too big to solve"""
+    from mcts import mcts_move
+
+    return mcts_move(board)
+
+
+# Precomputed answers for Hard and Impossible, see load_perfect_table
+perfect_table = None
+# Set by use_perfect_table until the first 3x3 lookup maps the table
+_table_pending = False
+
+
+def load_perfect_table(path=None):
+    """Memory-map the perfect-play table if it has been generated"""
+    global perfect_table, _table_pending
+    from perfect_play import DEFAULT_PATH, PerfectTable
+
+    _table_pending = False
+    path = path or DEFAULT_PATH
+    if not os.path.exists(path):
+        return None
+    perfect_table = PerfectTable(path)
+    return perfect_table
+
+
+def use_perfect_table():
+    """Let Hard and Impossible use the table, mapped when first needed
+
+    Nothing is read until a 3x3 Hard or Impossible position comes up, so
+    starting a game on any other level or board costs nothing.
+    """
+    global _table_pending
+    if perfect_table is None:
+        _table_pending = True
+
+
+def classic_table(geometry):
+    """The perfect-play table for 3x3 positions, or None"""
+    if geometry != CLASSIC:
+        return None
+    if _table_pending:
+        load_perfect_table()
+    return perfect_table
+
+
+# Computer strategy for each difficulty level
+STRATEGIES = {
+    'Easy': random_move,
+    'Medium': medium_move,
+    'Hard': best_move,
+    'Impossible': impossible_move,
+    'Master': master_move,
+}
+
+
+def report_node_counts():
+    """Print nodes and branching factor per move with and without the table"""
+    board = Board()
+    board.make(4, "X")
+    for name, win, draw in (("Hard", 10, 0), ("Impossible", 1000, -50)):
+        plain = Search(win, draw)
+        cached = Search(win, draw, TranspositionTable())
+        for label, search in (("no table", plain), ("cold table", cached),
+                              ("warm table", cached)):
+            result = search.best_move(board)
+            print(f"{name:<10} {label:<10} {result.nodes:>6} nodes  "
+                  f"depth {result.depth}  EBF {result.branching_factor:.2f}  "
+                  f"{result.elapsed_ms:.1f} ms  per depth {result.iteration_nodes}")
+        print(f"{name:<10} {cached.table.stats()}")
+
+
+if __name__ == "__main__":
+    report_node_counts()
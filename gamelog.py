@@ -0,0 +1,200 @@
+"""Append-only binary log of finished games
+
+The file starts with a small header. After it, each game is an 8-byte
+record header (level, board size, outcome, move count and a Unix
+timestamp) followed by one byte per move. A byte is enough, since the
+largest board has 225 cells. Moves alternate X, O, X, ... and are
+stored as cell indexes. Records are written with a single append, so
+several writers can share one file, and a crash can at worst cut off
+the last record. Readers stop at a cut-off record, and opening the log
+for writing truncates it first, so later games never land behind one.
+
+Readers walk the file through mmap, so scanning millions of games
+never loads the log into memory.
+
+    python gamelog.py [path] [--openings N]
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import Counter, namedtuple
+
+MAGIC = b"XOGL"
+VERSION = 1
+# magic, version
+HEADER = struct.Struct("<4sH")
+# level, board size, outcome, move count, timestamp
+RECORD = struct.Struct("<BBBBI")
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "xo_games.log")
+
+# Codes are stored in the file, so only ever append to these
+LEVELS = ('Easy', 'Medium', 'Hard', 'Impossible', 'Master')
+SIZES = ('3x3', '4x4', '5x5', '7x7', '10x10', '15x15', '4x4x4')
+X_WON = "X won"
+O_WON = "O won"
+DRAW = "draw"
+ABANDONED = "abandoned"
+OUTCOMES = (X_WON, O_WON, DRAW, ABANDONED)
+
+GameRecord = namedtuple('GameRecord', 'level size outcome moves timestamp')
+
+
+class GameLog:
+    """Appends finished games to a log file"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.file = open(path, "ab")
+        size = self.file.tell()
+        header = HEADER.pack(MAGIC, VERSION)
+        with open(path, "rb") as f:
+            found = f.read(HEADER.size)
+        # An empty file or a header cut off by a crash is fine; anything
+        # else would only be rejected later, by every reader
+        if not header.startswith(found):
+            self.file.close()
+            raise ValueError(f"{path} is not a game log")
+        if size < HEADER.size:
+            self.file.truncate(0)
+            self.file.write(header)
+            self.file.flush()
+            return
+        end = complete_length(path)
+        if end < size:
+            # A record cut off by a crash; appending after it would shift
+            # every later record out of step
+            self.file.truncate(end)
+
+    def append(self, level, size, outcome, moves, timestamp=None):
+        """Write one game; moves are the cells played, X first"""
+        if timestamp is None:
+            timestamp = time.time()
+        record = RECORD.pack(LEVELS.index(level), SIZES.index(size),
+                             OUTCOMES.index(outcome), len(moves), int(timestamp))
+        self.file.write(record + bytes(moves))
+        self.file.flush()
+
+    def close(self):
+        """Close the log file"""
+        self.file.close()
+
+
+def open_log(path=None):
+    """GameLog at path, $XO_GAME_LOG or DEFAULT_PATH; None if disabled,
+    unwritable or not a game log
+
+    Setting XO_GAME_LOG to an empty string turns logging off.
+    """
+    if path is None:
+        path = os.environ.get("XO_GAME_LOG", DEFAULT_PATH)
+    if not path:
+        return None
+    try:
+        return GameLog(path)
+    except (OSError, ValueError):
+        return None
+
+
+def complete_length(path=DEFAULT_PATH):
+    """Bytes up to the end of the last whole record, or the file size if
+    it is not a game log (which is left alone)
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if HEADER.unpack_from(data, 0) != (MAGIC, VERSION):
+                return size
+            offset = HEADER.size
+            while offset + RECORD.size <= size:
+                count = data[offset + 3]
+                if offset + RECORD.size + count > size:
+                    break
+                offset += RECORD.size + count
+            return offset
+
+
+def scan(path=DEFAULT_PATH):
+    """Yield (level, size, outcome, moves, timestamp) codes for every game
+
+    Levels, sizes and outcomes stay as their integer codes and moves as a
+    bytes slice, which keeps bulk queries cheap. Use records() for names.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a game log")
+            offset = HEADER.size
+            end = len(data)
+            unpack = RECORD.unpack_from
+            while offset + RECORD.size <= end:
+                level, size, outcome, count, timestamp = unpack(data, offset)
+                offset += RECORD.size
+                if offset + count > end:
+                    # Cut off mid-write
+                    return
+                yield level, size, outcome, data[offset:offset + count], timestamp
+                offset += count
+
+
+def records(path=DEFAULT_PATH):
+    """Yield every game as a GameRecord with names and a list of moves"""
+    for level, size, outcome, moves, timestamp in scan(path):
+        yield GameRecord(LEVELS[level], SIZES[size], OUTCOMES[outcome],
+                         list(moves), timestamp)
+
+
+def outcome_rates(path=DEFAULT_PATH):
+    """{level: {outcome: share of that level's games}} plus a 'games' count"""
+    counts = Counter((level, outcome) for level, _, outcome, _, _ in scan(path))
+    rates = {}
+    for (level, outcome), count in sorted(counts.items()):
+        rates.setdefault(LEVELS[level], {})[OUTCOMES[outcome]] = count
+    for by_outcome in rates.values():
+        games = sum(by_outcome.values())
+        for outcome in by_outcome:
+            by_outcome[outcome] /= games
+        by_outcome['games'] = games
+    return rates
+
+
+def common_openings(path=DEFAULT_PATH, plies=2, top=10):
+    """Most played first moves as [((size, (cells...)), count)]"""
+    counts = Counter((size, bytes(moves[:plies]))
+                     for _, size, _, moves, _ in scan(path) if len(moves) >= plies)
+    return [((SIZES[size], tuple(moves)), count)
+            for (size, moves), count in counts.most_common(top)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    parser.add_argument('--openings', type=int, default=2,
+                        help="plies per opening in the openings table")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        print(f"No game log at {args.path}")
+        return 1
+
+    print(f"{'level':<12}{'games':>9}" + "".join(f"{outcome:>11}" for outcome in OUTCOMES))
+    for level, rates in outcome_rates(args.path).items():
+        print(f"{level:<12}{rates['games']:>9}"
+              + "".join(f"{rates.get(outcome, 0):>11.1%}" for outcome in OUTCOMES))
+    print(f"\nMost common {args.openings}-ply openings")
+    for (size, moves), count in common_openings(args.path, args.openings, args.top):
+        print(f"{size:<7}{' '.join(map(str, moves)):<20}{count:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
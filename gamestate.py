@@ -0,0 +1,90 @@
+"""Immutable game positions and the undo/redo history of a game
+
+A GameState is a position plus the moves that reached it. It never
+changes: play returns a new state. The UI, the computer's search and
+the analysis overlay can all hold the same state at once without
+copying or locking it. Each search builds its own Board from a state
+with board(), so a UI callback never sees a board in the middle of a
+search.
+"""
+from collections import namedtuple
+
+from engine import CLASSIC, Board, Position
+
+
+class GameState(Position, namedtuple('GameState', 'geometry x o moves x_lines o_lines')):
+    """Position as X and O bitboards, the cells played so far (X first)
+    and the indexes of the lines each player has completed
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def start(cls, geometry=CLASSIC):
+        """Empty board of the given geometry"""
+        return cls(geometry, 0, 0, (), (), ())
+
+    def completed_lines(self, player):
+        """Indexes of the lines player has completed, in the order made"""
+        return self.x_lines if player == "X" else self.o_lines
+
+    def play(self, cell):
+        """New state with the player to move's mark on cell"""
+        if not 0 <= cell < self.geometry.cells or not self.is_empty(cell):
+            raise ValueError(f"cell {cell} is not free")
+        geometry = self.geometry
+        moves = self.moves + (cell,)
+        # Only lines through the new mark can have been completed
+        if self.to_move() == "X":
+            x = self.x | 1 << cell
+            done = tuple(line for line in geometry.cell_lines[cell]
+                         if x & geometry.masks[line] == geometry.masks[line])
+            return self._replace(x=x, moves=moves, x_lines=self.x_lines + done)
+        o = self.o | 1 << cell
+        done = tuple(line for line in geometry.cell_lines[cell]
+                     if o & geometry.masks[line] == geometry.masks[line])
+        return self._replace(o=o, moves=moves, o_lines=self.o_lines + done)
+
+    def board(self):
+        """A new Board for this position, for a search to work on"""
+        return Board(self.x, self.o, geometry=self.geometry)
+
+
+class History:
+    """Every state of one game, with a cursor for undo and redo
+
+    Pushing a new state after an undo drops the states that could have
+    been redone, like any editor's undo stack.
+    """
+
+    def __init__(self, state):
+        self.states = [state]
+        self.index = 0
+
+    @property
+    def current(self):
+        return self.states[self.index]
+
+    def push(self, state):
+        """Make state current, after the current one"""
+        del self.states[self.index + 1:]
+        self.states.append(state)
+        self.index += 1
+
+    def can_undo(self):
+        return self.index > 0
+
+    def can_redo(self):
+        return self.index < len(self.states) - 1
+
+    def undo(self):
+        """Step back one ply; return the state there"""
+        if self.can_undo():
+            self.index -= 1
+        return self.current
+
+    def redo(self):
+        """Step forward one ply; return the state there"""
+        if self.can_redo():
+            self.index += 1
+        return self.current
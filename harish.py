@@ -1,7 +1,18 @@
+import math
+import time
 import tkinter as tk
 from tkinter import messagebox
-import math
-import random
+import analysis
+import metrics
+from ai_worker import MoveWorker
+from animation import FrameScheduler
+from gamelog import ABANDONED, DRAW, O_WON, X_WON, open_log
+from engine import BOARD_SIZES, STRATEGIES, geometry_for, use_perfect_table
+from gamestate import GameState, History
+
+# Analysis overlay text color for each kind of cell value
+HINT_COLORS = {analysis.WIN: '#00FF88', analysis.DRAW: '#FFFF00',
+               analysis.LOSS: '#FF4040', analysis.UNCLEAR: '#A0A0A0'}
 
 class FlameXOGame:
     def __init__(self):
@@ -32,15 +43,51 @@ class FlameXOGame:
         self.root.resizable(False, False)
         self.root.configure(bg='#0D0D0D')
         
+        # Hard and Impossible become table lookups once perfect_play.py
+        # has generated the table; otherwise they search as before. The
+        # table is mapped on the first 3x3 move that needs it.
+        use_perfect_table()
+        
+        # Every timed effect (dance, win glow, "thinking" delay) runs off
+        # this one timer, so a restart can cancel them all together
+        self.scheduler = FrameScheduler(self.root)
+        
+        # Searches run on a worker thread so the window never freezes;
+        # 600 ms is the least time the "thinking" message stays up
+        self.worker = MoveWorker(self.scheduler, min_delay_ms=600)
+        
+        # The analysis overlay searches on its own thread with its own
+        # tables and cancel token, so it never holds up or cancels the
+        # computer's move, and the computer's never cancels it
+        self.analyzer = analysis.Analyzer()
+        self.analysis_worker = MoveWorker(self.scheduler, min_delay_ms=0)
+        
         self.selected_level = None
+        self.geometry = None
+        self.game_active = False
+        
+        # The game is a history of immutable GameStates; the current one
+        # is what the board shows and what the workers search from
+        self.state = None
+        self.history = None
+        
+        # Every game, finished or abandoned, is appended to the game log
+        self.game_log = open_log()
+        # Closing the window abandons the game while its widgets still exist
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        # Moves of the last game logged, so a game reopened with undo
+        # and ended the same way again is not logged twice
+        self.logged_moves = None
+        
+        # Both screens are built once and swapped by hiding one and
+        # showing the other, so switching never creates widgets
+        self.build_mode_selection()
+        self.build_game_ui()
         self.show_mode_selection()
 
-    def show_mode_selection(self):
-        """Show difficulty selection screen first"""
-        self.clear_root()
-        
-        frame = tk.Frame(self.root, bg='#1A0A00', relief='ridge', bd=5)
-        frame.pack(fill='both', expand=True, padx=10, pady=10)
+    def build_mode_selection(self):
+        """Build the difficulty selection screen"""
+        frame = self.mode_screen = tk.Frame(self.root, bg='#1A0A00', relief='ridge', bd=5)
         
         # Title
         title_text = "🔥 Choose Your Challenge 🔥"
@@ -61,6 +108,7 @@ class FlameXOGame:
             ("🟢 Easy", "Easy", '#00FF00'),
             ("🟡 Medium", "Medium", '#FFFF00'),
             ("🟠 Hard", "Hard", '#FF8000'),
+            ("🟣 Master", "Master", '#BF40FF'),
             ("🔴 Impossible", "Impossible", '#FF0000')
         ]
         
@@ -82,6 +130,20 @@ class FlameXOGame:
                                    fg='#FF6347', bg='#1A0A00')
         angry_bird_label.pack(pady=8)
         
+        # Board size picker
+        size_frame = tk.Frame(frame, bg='#1A0A00')
+        size_frame.pack(pady=5)
+        size_label = tk.Label(size_frame, text="Board:",
+                              font=('Comic Sans MS', 12, 'bold'),
+                              fg='#FFD700', bg='#1A0A00')
+        size_label.pack(side='left', padx=5)
+        self.size_var = tk.StringVar(value="3x3")
+        size_menu = tk.OptionMenu(size_frame, self.size_var, *BOARD_SIZES)
+        size_menu.config(font=('Comic Sans MS', 11, 'bold'),
+                         bg='#FF8000', fg='white', activebackground='#FF4500',
+                         highlightthickness=0)
+        size_menu.pack(side='left')
+        
         # Start game button
         start_btn = tk.Button(frame, text="🎮 START GAME 🎮", 
                              font=('Impact', 14, 'bold'),
@@ -91,84 +153,81 @@ class FlameXOGame:
                              command=self.start_game)
         start_btn.pack(pady=20)
 
+    @metrics.timed('tk.show_mode_selection')
+    def show_mode_selection(self):
+        """Show difficulty selection screen first"""
+        self.worker.cancel()
+        self.scheduler.cancel_all()
+        self.abandon_game()
+        self.analysis_worker.cancel()
+        self.game_screen.pack_forget()
+        self.mode_screen.pack(fill='both', expand=True, padx=10, pady=10)
+
     def start_game(self):
         """Start the game with selected difficulty"""
         self.selected_level = self.level_var.get()
+        self.size_name = self.size_var.get()
+        self.geometry = geometry_for(self.size_name)
         
         if self.selected_level == 'Impossible':
             messagebox.showinfo("🔥 IMPOSSIBLE MODE SELECTED! 🔥", 
                               "WARNING: Computer will ALWAYS win in this mode!\n" +
                               "Dare to challenge if you are a boy win!\n- Harish 🔥")
         
-        self.clear_root()
+        self.mode_screen.pack_forget()
         self.setup_game_ui()
+        self.game_screen.pack(fill='both', expand=True)
 
-    def clear_root(self):
-        """Clear all widgets from root"""
-        for widget in self.root.winfo_children():
-            widget.destroy()
-
-    def setup_game_ui(self):
-        """Setup the main game interface"""
-        # Initialize game state
-        self.board = [["" for _ in range(3)] for _ in range(3)]
-        self.buttons = []
-        self.game_active = True
-        self.player_turn = True
+    def build_game_ui(self):
+        """Build the game screen; setup_game_ui fits it to each new game"""
+        self.game_screen = tk.Frame(self.root, bg='#0D0D0D')
         
         # Title with current mode
-        title_frame = tk.Frame(self.root, bg='#2D1100', height=60)
+        title_frame = tk.Frame(self.game_screen, bg='#2D1100', height=60)
         title_frame.pack(fill='x')
         title_frame.pack_propagate(False)
         
-        title_label = tk.Label(title_frame, 
-                              text=f"🔥 XO - {self.selected_level} Mode 🔥",
-                              font=('Impact', 16, 'bold'), 
-                              fg='#FFD700', bg='#2D1100')
-        title_label.pack(pady=15)
+        self.title_label = tk.Label(title_frame, 
+                                   font=('Impact', 16, 'bold'), 
+                                   fg='#FFD700', bg='#2D1100')
+        self.title_label.pack(pady=15)
         
         # Flame decorative elements
-        flame_label = tk.Label(self.root, text="🔥" * 18, 
+        flame_label = tk.Label(self.game_screen, text="🔥" * 18, 
                               font=('Arial', 12), fg='#FF4500', bg='#0D0D0D')
         flame_label.pack(pady=5)
         
-        # Game board frame
-        self.board_frame = tk.Frame(self.root, bg='#330000', relief='sunken', bd=3)
-        self.board_frame.pack(padx=20, pady=15)
-        
-        # Create 3x3 button grid with responsive sizing
-        button_size = 80  # Base size for buttons
-        font_size = 24    # Base font size
+        # The board is one canvas with a rectangle and a text item per
+        # cell, instead of a grid of buttons
+        self.board_px = 270  # Base size, three 90px cells
         
         # Adjust for smaller screens
         if self.root.winfo_reqwidth() < 400:
-            button_size = 60
-            font_size = 20
-        
-        for i in range(3):
-            row_buttons = []
-            for j in range(3):
-                btn = tk.Button(self.board_frame, text="", 
-                               width=6, height=3,
-                               font=('Impact', font_size, 'bold'),
-                               bg='#4A1A1A', fg='white',
-                               activebackground='#6A2A2A',
-                               relief='raised', bd=5,
-                               command=lambda r=i, c=j: self.player_move(r, c))
-                btn.grid(row=i, column=j, padx=3, pady=3)
-                row_buttons.append(btn)
-            self.buttons.append(row_buttons)
+            self.board_px = 210
+        
+        # Game board frame
+        board_frame = tk.Frame(self.game_screen, bg='#330000', relief='sunken', bd=3)
+        board_frame.pack(padx=20, pady=15)
+        self.canvas = tk.Canvas(board_frame, width=self.board_px, height=self.board_px,
+                                bg='#330000', bd=0, highlightthickness=0)
+        self.canvas.pack()
+        self.canvas.bind('<Button-1>', self.canvas_click)
+        # Cell items are created on demand and reused by every later game
+        self.cell_rects = []
+        self.cell_marks = []
+        self.cell_hints = []
+        # Overlay (text, color) currently drawn per cell
+        self.shown_hints = {}
         
         # Status label
-        self.status_label = tk.Label(self.root, 
-                                    text="🎯 Your Move! You are X 🎯",
+        self.status_label = tk.Label(self.game_screen, 
                                     font=('Comic Sans MS', 12, 'bold'), 
-                                    fg='#00FF88', bg='#0D0D0D',
+                                    bg='#0D0D0D',
                                     wraplength=300, justify='center')
         self.status_label.pack(pady=10)
         
         # Control buttons frame
-        control_frame = tk.Frame(self.root, bg='#0D0D0D')
+        control_frame = tk.Frame(self.game_screen, bg='#0D0D0D')
         control_frame.pack(pady=10)
         
         # Restart button
@@ -189,6 +248,18 @@ class FlameXOGame:
                             command=self.show_mode_selection)
         mode_btn.pack(side='left', padx=5)
         
+        # Analysis overlay toggle
+        self.analysis_var = tk.BooleanVar(value=False)
+        analysis_btn = tk.Checkbutton(control_frame, text="🔍 Analysis",
+                                      variable=self.analysis_var,
+                                      command=self.toggle_analysis,
+                                      font=('Arial', 10, 'bold'),
+                                      bg='#0D0D0D', fg='#00BFFF',
+                                      selectcolor='#1A0A00',
+                                      activebackground='#0D0D0D',
+                                      activeforeground='#00BFFF')
+        analysis_btn.pack(side='left', padx=5)
+        
         # Quit button
         quit_btn = tk.Button(control_frame, text="🚪 Quit",
                             font=('Arial', 10, 'bold'),
@@ -197,65 +268,182 @@ class FlameXOGame:
                             padx=15, pady=5,
                             command=self.root.quit)
         quit_btn.pack(side='right', padx=10)
+        
+        # Undo and redo take back or replay a whole turn
+        history_frame = tk.Frame(self.game_screen, bg='#0D0D0D')
+        history_frame.pack()
+        self.undo_btn = tk.Button(history_frame, text="↶ Undo",
+                                  font=('Arial', 10, 'bold'),
+                                  bg='#4A1A1A', fg='white',
+                                  relief='raised', bd=3,
+                                  padx=15, pady=2,
+                                  command=self.undo)
+        self.undo_btn.pack(side='left', padx=5)
+        self.redo_btn = tk.Button(history_frame, text="↷ Redo",
+                                  font=('Arial', 10, 'bold'),
+                                  bg='#4A1A1A', fg='white',
+                                  relief='raised', bd=3,
+                                  padx=15, pady=2,
+                                  command=self.redo)
+        self.redo_btn.pack(side='left', padx=5)
+        self.root.bind('<Control-z>', lambda event: self.undo())
+        self.root.bind('<Control-y>', lambda event: self.redo())
+
+    @metrics.timed('tk.setup_game_ui')
+    def setup_game_ui(self):
+        """Fit the game screen to the selected level and board size"""
+        title_text = f"🔥 XO - {self.selected_level} Mode 🔥"
+        if self.geometry.cells != 9:
+            title_text = (f"🔥 {self.selected_level} {self.geometry.name}"
+                          f" - {self.geometry.k} in a row 🔥")
+        self.title_label.config(text=title_text)
+        self.layout_board()
+        self.reset_game()
+
+    def layout_board(self):
+        """Position one rectangle and one mark per cell on the canvas
+
+        The layers of a 3D board are drawn side by side, two per row.
+        """
+        rows, cols, layers = self.geometry.rows, self.geometry.cols, self.geometry.layers
+        self.layer_side = math.ceil(math.sqrt(layers))
+        self.layer_gap = 10 if layers > 1 else 0
+        self.layer_px = (self.board_px - (self.layer_side - 1) * self.layer_gap) / self.layer_side
+        # Shrink cells so larger boards still fit the canvas
+        gap = 6 if max(rows, cols) == 3 else 2
+        self.cell_px = self.layer_px / max(rows, cols)
+        font_size = max(8, round(24 * self.cell_px / 90))
+        hint_size = max(6, round(font_size * 0.45))
+        
+        canvas = self.canvas
+        while len(self.cell_rects) < self.geometry.cells:
+            self.cell_rects.append(canvas.create_rectangle(
+                0, 0, 0, 0, outline='#1A0000', tags=('cell',)))
+            self.cell_marks.append(canvas.create_text(
+                0, 0, fill='white', tags=('mark',)))
+            # Hidden until the first analysis comes in
+            self.cell_hints.append(canvas.create_text(
+                0, 0, text="", state='hidden', tags=('hint',)))
+        
+        # Cells move and renumber, so no hint carries over to the new layout
+        canvas.itemconfig('hint', text="")
+        self.shown_hints = {}
+        items = zip(self.cell_rects, self.cell_marks, self.cell_hints)
+        for cell, (rect, mark, hint) in enumerate(items):
+            if cell >= self.geometry.cells:
+                # Items of a larger board stay around, hidden, for reuse
+                canvas.itemconfig(rect, state='hidden')
+                canvas.itemconfig(mark, state='hidden')
+                canvas.itemconfig(hint, state='hidden')
+                canvas.dtag(hint, 'overlay')
+                continue
+            layer, rest = divmod(cell, self.geometry.layer_cells)
+            i, j = divmod(rest, cols)
+            across, down = layer % self.layer_side, layer // self.layer_side
+            x = across * (self.layer_px + self.layer_gap) + j * self.cell_px
+            y = down * (self.layer_px + self.layer_gap) + i * self.cell_px
+            canvas.coords(rect, x + gap / 2, y + gap / 2,
+                          x + self.cell_px - gap / 2, y + self.cell_px - gap / 2)
+            canvas.coords(mark, x + self.cell_px / 2, y + self.cell_px / 2)
+            canvas.itemconfig(rect, state='normal')
+            canvas.itemconfig(mark, state='normal', font=('Impact', font_size, 'bold'))
+            canvas.coords(hint, x + self.cell_px / 2, y + self.cell_px / 2)
+            canvas.itemconfig(hint, font=('Arial', hint_size, 'bold'))
+            canvas.addtag_withtag('overlay', hint)
+
+    def canvas_click(self, event):
+        """Turn a click on the board into a player move"""
+        span = self.layer_px + self.layer_gap
+        across, x = divmod(event.x, span)
+        down, y = divmod(event.y, span)
+        layer = int(down) * self.layer_side + int(across)
+        row = int(y // self.cell_px)
+        col = int(x // self.cell_px)
+        # Clicks in the gap between layers land past the last row or column
+        if (0 <= layer < self.geometry.layers
+                and 0 <= row < self.geometry.rows and 0 <= col < self.geometry.cols):
+            self.player_move(layer * self.geometry.rows + row, col)
+
+    def draw_mark(self, cell, player, color):
+        """Show player's mark on cell and stop it lighting up on hover"""
+        self.canvas.itemconfig(self.cell_marks[cell], text=player)
+        self.canvas.itemconfig(self.cell_rects[cell], fill=color, activefill=color)
+        if cell in self.shown_hints:
+            self.canvas.itemconfig(self.cell_hints[cell], text="")
+            del self.shown_hints[cell]
 
     def player_move(self, row, col):
         """Handle player's move"""
-        if not self.game_active or not self.player_turn or self.board[row][col] != "":
+        cell = self.geometry.cell_index(row, col)
+        if (not self.game_active or self.state.to_move() != "X"
+                or not self.state.is_empty(cell)):
             return
         
-        # Player makes move
-        self.board[row][col] = "X"
-        self.buttons[row][col].config(text="X", bg='#00BFFF', fg='white', state='disabled')
-        self.player_turn = False
-        
+        # Player makes move; the overlay's values are for the old position
+        self.hide_analysis()
+        self.push_state(self.state.play(cell))
+        self.draw_mark(cell, "X", '#00BFFF')
+        self.after_player_move()
+
+    def after_player_move(self):
+        """End the game or hand over to the computer after X has moved"""
         # Check if player won (but NEVER in Impossible mode)
-        if self.check_winner("X") and self.selected_level != 'Impossible':
+        if self.state.player_won(self.selected_level):
             self.highlight_winner("X")
             self.status_label.config(text="🎉 You Won! 🎉", fg='#00FF00')
-            self.game_active = False
+            self.end_game(X_WON)
             messagebox.showinfo("Victory!", f"You won {self.selected_level} mode!")
             return
         
         # Check for draw
-        if self.is_board_full():
+        if self.state.is_board_full():
             if self.selected_level == 'Impossible':
                 # Special message for Impossible mode draw
                 self.status_label.config(text="🤝 DRAW!\nHence proved you are a girl!\n- Harish", fg='#FF4500')
                 self.animate_dancing_girl()
-                self.game_active = False
+                self.end_game(DRAW)
                 messagebox.showinfo("Draw!", "It's a draw!\nHence proved you are a girl! - Harish 😄")
             else:
                 self.status_label.config(text="🤝 It's a Draw! 🤝", fg='#FFFF00')
-                self.game_active = False
+                self.end_game(DRAW)
                 messagebox.showinfo("Draw", "Game ended in a draw!")
             return
         
         # Computer's turn
         self.status_label.config(text="🤖 Computer thinking... 🤖", fg='#FF4500')
-        self.root.after(600, self.computer_move)
+        self.computer_move()
 
     def computer_move(self):
-        """Handle computer's move based on difficulty"""
+        """Start the computer's move based on difficulty"""
         if not self.game_active:
             return
         
-        # Select AI strategy based on difficulty
-        if self.selected_level == 'Easy':
-            move = self.random_move()
-        elif self.selected_level == 'Medium':
-            move = self.medium_move()
-        elif self.selected_level == 'Hard':
-            move = self.best_move()
-        else:  # Impossible mode - Computer MUST win
-            move = self.impossible_move()
-        
-        if move:
-            row, col = move
-            self.board[row][col] = "O"
-            self.buttons[row][col].config(text="O", bg='#FF4500', fg='white', state='disabled')
-            
+        if metrics.enabled:
+            self.clicked_at = time.perf_counter()
+        # Select AI strategy based on difficulty; the search runs in the
+        # background and finish_computer_move gets the answer
+        self.worker.request(self.state, STRATEGIES[self.selected_level],
+                            self.finish_computer_move)
+
+    def finish_computer_move(self, move):
+        """Play the computer's move once the worker has found it"""
+        if not self.game_active:
+            return
+        
+        if move is not None:
+            self.push_state(self.state.play(move))
+            self.draw_mark(move, "O", '#FF4500')
+            if metrics.enabled:
+                # Click to reply on screen, including the "thinking" delay
+                metrics.observe(f"turn.{self.selected_level}",
+                                (time.perf_counter() - self.clicked_at) * 1000)
+        self.after_computer_move()
+
+    def after_computer_move(self):
+        """End the game or give the player the next turn after O has moved"""
+        if self.state.moves:
             # Check if computer won
-            if self.check_winner("O"):
+            if self.state.check_winner("O"):
                 self.highlight_winner("O")
                 if self.selected_level == 'Impossible':
                     # Special message for Impossible mode win with dancing girl
@@ -265,11 +453,11 @@ class FlameXOGame:
                 else:
                     self.status_label.config(text="🔥 COMPUTER WINS! 🔥", fg='#FF0000')
                     messagebox.showinfo("Defeated!", f"Computer won {self.selected_level} mode!")
-                self.game_active = False
+                self.end_game(O_WON)
                 return
             
             # Check for draw
-            if self.is_board_full():
+            if self.state.is_board_full():
                 if self.selected_level == 'Impossible':
                     # Special message for Impossible mode draw with dancing girl
                     self.status_label.config(text="🤝 DRAW!\nHence proved you are a girl!\n- Harish", fg='#FF4500')
@@ -278,11 +466,123 @@ class FlameXOGame:
                 else:
                     self.status_label.config(text="🤝 It's a Draw! 🤝", fg='#FFFF00')
                     messagebox.showinfo("Draw", "Game ended in a draw!")
-                self.game_active = False
+                self.end_game(DRAW)
                 return
         
-        self.player_turn = True
         self.status_label.config(text="🎯 Your Move! Fight Back! 🎯", fg='#00FF88')
+        self.start_pondering()
+        self.start_analysis()
+
+    def end_game(self, outcome):
+        """Stop play and record the game"""
+        self.game_active = False
+        # Logged before any widget is touched, in case the window is gone
+        moves = self.state.moves
+        if self.game_log is not None and moves != self.logged_moves:
+            self.game_log.append(self.selected_level, self.size_name, outcome, moves)
+        self.logged_moves = moves
+        self.hide_analysis()
+
+    def abandon_game(self):
+        """Record a game left unfinished by a restart, mode change or quit
+
+        A finished game reopened with undo has already been logged.
+        """
+        if self.game_active and self.state.moves and self.logged_moves is None:
+            self.end_game(ABANDONED)
+
+    def push_state(self, state):
+        """Make state current as the next move in the history"""
+        self.history.push(state)
+        self.state = state
+        self.update_history_buttons()
+
+    def update_history_buttons(self):
+        """Enable undo and redo only when there is a move to step over"""
+        self.undo_btn.config(state='normal' if self.history.can_undo() else 'disabled')
+        self.redo_btn.config(state='normal' if self.history.can_redo() else 'disabled')
+
+    def undo(self):
+        """Take back moves until it is the player's turn again"""
+        if self.history is None or not self.history.can_undo():
+            return
+        state = self.history.undo()
+        while state.to_move() != "X" and self.history.can_undo():
+            state = self.history.undo()
+        self.restore(state)
+
+    def redo(self):
+        """Replay moves until it is the player's turn again or the game ends"""
+        if self.history is None or not self.history.can_redo():
+            return
+        state = self.history.redo()
+        while state.to_move() != "X" and self.history.can_redo():
+            state = self.history.redo()
+        self.restore(state)
+
+    @metrics.timed('tk.restore')
+    def restore(self, state):
+        """Show a state from the history and carry on playing from it"""
+        self.worker.cancel()
+        self.scheduler.cancel_all()
+        self.hide_analysis()
+        self.state = state
+        self.game_active = True
+        self.update_history_buttons()
+        self.clear_board()
+        for ply, cell in enumerate(state.moves):
+            if ply % 2:
+                self.draw_mark(cell, "O", '#FF4500')
+            else:
+                self.draw_mark(cell, "X", '#00BFFF')
+        if state.to_move() == "O":
+            self.after_player_move()
+        else:
+            self.after_computer_move()
+
+    def toggle_analysis(self):
+        """Show or hide the analysis overlay"""
+        if self.analysis_var.get():
+            self.start_analysis()
+        else:
+            self.hide_analysis()
+
+    def start_analysis(self):
+        """Work out the value of every free cell in the background"""
+        if self.analysis_var.get() and self.game_active and self.state.to_move() == "X":
+            self.analysis_worker.request(self.state, self.analyzer.analyze,
+                                         self.show_analysis)
+
+    def show_analysis(self, values):
+        """Draw finished cell values over the board"""
+        self.draw_hints({cell: (value.label, HINT_COLORS[value.outcome])
+                         for cell, value in values.items()})
+        # Disabled so hovering the text still lights up the cell
+        self.canvas.itemconfig('overlay', state='disabled')
+
+    def hide_analysis(self):
+        """Stop any analysis in progress and hide the overlay
+
+        The hints stay on the canvas, hidden, so the next result only
+        redraws the cells whose value changed.
+        """
+        self.analysis_worker.cancel()
+        self.canvas.itemconfig('overlay', state='hidden')
+
+    @metrics.timed('tk.draw_hints')
+    def draw_hints(self, hints):
+        """Show {cell: (text, color)}, touching only cells that changed"""
+        shown = self.shown_hints
+        for cell in shown.keys() | hints.keys():
+            hint = hints.get(cell)
+            if shown.get(cell) != hint:
+                text, color = hint or ("", 'white')
+                self.canvas.itemconfig(self.cell_hints[cell], text=text, fill=color)
+        self.shown_hints = hints
+
+    def start_pondering(self):
+        """Let the computer work out its replies while the player thinks"""
+        self.worker.ponder(self.state, STRATEGIES[self.selected_level])
 
     def animate_dancing_girl(self):
         """Dancing girl animation for computer wins/draws in Impossible mode"""
@@ -298,248 +598,70 @@ class FlameXOGame:
             "🕺🎪 Girl is dancing! 🎪🕺\nIt was Harish! 💃🎪"
         ]
         
-        self.dance_frame = 0
-        self.original_text = self.status_label.cget('text')
+        # Color cycle for extra effect
+        colors = ['#FF69B4', '#FF1493', '#FF6347', '#FFD700', '#00FF7F', '#00BFFF', '#DA70D6']
+        original_text = self.status_label.cget('text')
         
-        def animate_dance():
-            if not hasattr(self, 'status_label') or not self.status_label.winfo_exists():
-                return
-            
-            if self.dance_frame < len(dance_frames) * 3:  # Loop 3 times
-                current_frame = dance_frames[self.dance_frame % len(dance_frames)]
-                
-                # Color cycle for extra effect
-                colors = ['#FF69B4', '#FF1493', '#FF6347', '#FFD700', '#00FF7F', '#00BFFF', '#DA70D6']
-                color = colors[self.dance_frame % len(colors)]
-                
-                self.status_label.config(text=current_frame, fg=color)
-                self.dance_frame += 1
-                
-                # Continue animation
-                self.root.after(400, animate_dance)
-            else:
-                # Reset to original text after animation
-                self.status_label.config(text=self.original_text, fg='#FF4500')
+        frames = [[(self.status_label, {'text': dance_frames[i % len(dance_frames)],
+                                        'fg': colors[i % len(colors)]})]
+                  for i in range(len(dance_frames) * 3)]  # Loop 3 times
+        # Reset to original text after animation
+        frames.append([(self.status_label, {'text': original_text, 'fg': '#FF4500'})])
         
         # Start the dancing animation
-        animate_dance()
-
-    def random_move(self):
-        """Easy mode - Random move"""
-        empty_cells = [(i, j) for i in range(3) for j in range(3) if self.board[i][j] == ""]
-        return random.choice(empty_cells) if empty_cells else None
-
-    def medium_move(self):
-        """Medium mode - Win if possible, block sometimes, else random"""
-        # Try to win first
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    self.board[i][j] = "O"
-                    if self.check_winner("O"):
-                        self.board[i][j] = ""
-                        return (i, j)
-                    self.board[i][j] = ""
-        
-        # Try to block player (70% chance)
-        if random.random() < 0.7:
-            for i in range(3):
-                for j in range(3):
-                    if self.board[i][j] == "":
-                        self.board[i][j] = "X"
-                        if self.check_winner("X"):
-                            self.board[i][j] = ""
-                            return (i, j)
-                        self.board[i][j] = ""
-        
-        # Random move
-        return self.random_move()
-
-    def best_move(self):
-        """Hard mode - Optimal minimax strategy"""
-        best_score = -math.inf
-        best_move = None
-        
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    self.board[i][j] = "O"
-                    score = self.minimax(0, False)
-                    self.board[i][j] = ""
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_move = (i, j)
-        
-        return best_move
-
-    def impossible_move(self):
-        """Impossible mode - Computer ALWAYS wins, player can NEVER win"""
-        # First priority: Win immediately if possible
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    self.board[i][j] = "O"
-                    if self.check_winner("O"):
-                        self.board[i][j] = ""
-                        return (i, j)  # Winning move!
-                    self.board[i][j] = ""
-        
-        # Second priority: Block player from winning
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    self.board[i][j] = "X"
-                    if self.check_winner("X"):
-                        self.board[i][j] = ""
-                        return (i, j)  # Block player
-                    self.board[i][j] = ""
-        
-        # Third priority: Use enhanced minimax
-        return self.get_killer_move()
-
-    def get_killer_move(self):
-        """Enhanced minimax for Impossible mode"""
-        best_score = -math.inf
-        best_move = None
-        
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    self.board[i][j] = "O"
-                    score = self.killer_minimax(0, True)
-                    self.board[i][j] = ""
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_move = (i, j)
-        
-        return best_move
-
-    def killer_minimax(self, depth, is_maximizing):
-        """Enhanced minimax that heavily penalizes draws and favors wins"""
-        if self.check_winner("O"):
-            return 1000 - depth  # Huge reward for winning
-        if self.check_winner("X"):
-            return -1000 + depth  # Huge penalty for losing
-        if self.is_board_full():
-            return -50  # Penalty for draws - we want to WIN!
-        
-        if is_maximizing:
-            best_score = -math.inf
-            for i in range(3):
-                for j in range(3):
-                    if self.board[i][j] == "":
-                        self.board[i][j] = "O"
-                        score = self.killer_minimax(depth + 1, False)
-                        self.board[i][j] = ""
-                        best_score = max(score, best_score)
-            return best_score
-        else:
-            best_score = math.inf
-            for i in range(3):
-                for j in range(3):
-                    if self.board[i][j] == "":
-                        self.board[i][j] = "X"
-                        score = self.killer_minimax(depth + 1, True)
-                        self.board[i][j] = ""
-                        best_score = min(score, best_score)
-            return best_score
-
-    def minimax(self, depth, is_maximizing):
-        """Standard minimax algorithm for Hard mode"""
-        if self.check_winner("O"):
-            return 10 - depth
-        if self.check_winner("X"):
-            return depth - 10
-        if self.is_board_full():
-            return 0
-        
-        if is_maximizing:
-            best_score = -math.inf
-            for i in range(3):
-                for j in range(3):
-                    if self.board[i][j] == "":
-                        self.board[i][j] = "O"
-                        score = self.minimax(depth + 1, False)
-                        self.board[i][j] = ""
-                        best_score = max(score, best_score)
-            return best_score
-        else:
-            best_score = math.inf
-            for i in range(3):
-                for j in range(3):
-                    if self.board[i][j] == "":
-                        self.board[i][j] = "X"
-                        score = self.minimax(depth + 1, True)
-                        self.board[i][j] = ""
-                        best_score = min(score, best_score)
-            return best_score
-
-    def check_winner(self, player):
-        """Check if the specified player has won"""
-        # Check rows, columns, and diagonals
-        for i in range(3):
-            if all([self.board[i][j] == player for j in range(3)]):
-                return True
-            if all([self.board[j][i] == player for j in range(3)]):
-                return True
-        
-        if all([self.board[i][i] == player for i in range(3)]):
-            return True
-        if all([self.board[i][2-i] == player for i in range(3)]):
-            return True
-        
-        return False
-
-    def is_board_full(self):
-        """Check if the board is completely filled"""
-        return all([cell != "" for row in self.board for cell in row])
+        self.scheduler.animate(frames, 400)
 
+    @metrics.timed('tk.highlight_winner')
     def highlight_winner(self, player):
         """Highlight winning combination with glow effect"""
         win_color = '#00FFFF' if player == "X" else '#FFD700'
         
-        # Find and highlight winning cells
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == player:
-                    if self.is_winning_cell(i, j, player):
-                        self.buttons[i][j].config(bg=win_color, relief='sunken')
-
-    def is_winning_cell(self, row, col, player):
-        """Check if a cell is part of the winning combination"""
-        # Check row
-        if all([self.board[row][j] == player for j in range(3)]):
-            return True
-        # Check column
-        if all([self.board[j][col] == player for j in range(3)]):
-            return True
-        # Check main diagonal
-        if row == col and all([self.board[i][i] == player for i in range(3)]):
-            return True
-        # Check anti-diagonal
-        if row + col == 2 and all([self.board[i][2-i] == player for i in range(3)]):
-            return True
-        return False
+        # The board already knows its completed lines
+        cells = [(self.canvas, self.cell_rects[cell])
+                 for cell in self.state.winning_cells(player)]
+        
+        # Pulse the outline a few times, ending lit
+        frames = [[(cell, {'fill': win_color, 'activefill': win_color,
+                           'outline': 'white' if i % 2 else win_color, 'width': 3})
+                   for cell in cells]
+                  for i in range(8)]
+        self.scheduler.animate(frames, 120)
 
+    @metrics.timed('tk.reset_game')
     def reset_game(self):
         """Reset the current game"""
-        self.board = [["" for _ in range(3)] for _ in range(3)]
+        self.worker.cancel()
+        self.scheduler.cancel_all()
+        self.abandon_game()
+        self.hide_analysis()
+        self.state = GameState.start(self.geometry)
+        self.history = History(self.state)
+        self.logged_moves = None
         self.game_active = True
-        self.player_turn = True
-        
-        # Reset all buttons
-        for i in range(3):
-            for j in range(3):
-                self.buttons[i][j].config(text="", bg='#4A1A1A', fg='white', 
-                                        state='normal', relief='raised')
+        self.update_history_buttons()
+        self.clear_board()
         
         self.status_label.config(text="🎯 Your Move! You are X 🎯", fg='#00FF88')
+        self.start_pondering()
+        self.start_analysis()
+
+    def clear_board(self):
+        """Reset every cell at once through the shared tags"""
+        self.canvas.itemconfig('cell', fill='#4A1A1A', activefill='#6A2A2A',
+                               outline='#1A0000', width=1)
+        self.canvas.itemconfig('mark', text="")
+
+    def close(self):
+        """Record an unfinished game, then close the window"""
+        self.abandon_game()
+        self.root.destroy()
 
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        self.abandon_game()
+        self.worker.shutdown()
+        self.analysis_worker.shutdown()
 
 # Create and run the game
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""Load-test client for server.py
+
+Runs many simulated players at once, each on its own keep-alive
+connection. A player opens a session, plays random free cells until the
+game ends, deletes the session and starts over. Prints throughput and
+latency percentiles per request type.
+
+    python server.py &
+    python loadtest.py --players 2000 --seconds 30 --level Hard
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from bench import percentile
+from engine import BOARD_SIZES, STRATEGIES
+
+
+class Client:
+    """Minimal HTTP/1.1 JSON client over one keep-alive connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def call(self, method, path, body=None):
+        """Send one request; return (status, decoded JSON)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\n"
+                           f"Content-Length: {len(data)}\r\n\r\n").encode() + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def player(client, level, size, deadline, latencies, totals):
+    """Play games back to back until the deadline"""
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        status, state = await client.call("POST", "/sessions", {'level': level, 'size': size})
+        latencies['create'].append(time.perf_counter() - start)
+        if status != 201:
+            totals['errors'] += 1
+            continue
+        path = f"/sessions/{state['id']}"
+        while state['status'] == "playing" and time.monotonic() < deadline:
+            cell = random.choice([i for i, mark in enumerate(state['cells']) if mark == "."])
+            start = time.perf_counter()
+            status, state = await client.call("POST", path + "/move", {'cell': cell})
+            latencies['move'].append(time.perf_counter() - start)
+            if status != 200:
+                totals['errors'] += 1
+                break
+        if state.get('status', "playing") != "playing":
+            totals['games'] += 1
+            totals[state['status']] = totals.get(state['status'], 0) + 1
+        start = time.perf_counter()
+        await client.call("DELETE", path)
+        latencies['delete'].append(time.perf_counter() - start)
+
+
+async def run(host, port, players, seconds, level, size):
+    """Drive the server with players for seconds; return (latencies, totals, elapsed)"""
+    latencies = {'create': [], 'move': [], 'delete': []}
+    totals = {'games': 0, 'errors': 0}
+    clients = [Client(host, port) for _ in range(players)]
+    deadline = time.monotonic() + seconds
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(player(client, level, size, deadline, latencies, totals)
+                               for client in clients))
+    finally:
+        for client in clients:
+            client.close()
+    return latencies, totals, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--players', type=int, default=1000,
+                        help="concurrent simulated players (one connection each)")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--level', choices=list(STRATEGIES), default="Hard")
+    parser.add_argument('--size', choices=list(BOARD_SIZES), default="3x3")
+    args = parser.parse_args()
+
+    latencies, totals, elapsed = asyncio.run(
+        run(args.host, args.port, args.players, args.seconds, args.level, args.size))
+
+    requests = sum(len(samples) for samples in latencies.values())
+    print(f"{args.players} players, {elapsed:.1f}s: {requests / elapsed:,.0f} requests/s, "
+          f"{totals['games'] / elapsed:,.1f} games/s, {totals['errors']} errors")
+    results = {key: value for key, value in totals.items()
+               if key not in ('games', 'errors')}
+    print("results " + "  ".join(f"{key}={value}" for key, value in sorted(results.items())))
+    print(f"{'request':<8}{'count':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, samples in latencies.items():
+        if samples:
+            print(f"{name:<8}{len(samples):>9}"
+                  + "".join(f"{percentile(samples, q) * 1000:>10.2f}"
+                            for q in (0.5, 0.9, 0.99, 1.0)))
+    return 1 if totals['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
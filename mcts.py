@@ -0,0 +1,342 @@
+"""Monte Carlo tree search for boards too large to search exactly
+
+The tree grows one node per playout. Children are picked with UCT, and
+each new node is scored by a rollout: both sides win when they can,
+block a threat when they must, and otherwise play a random free cell.
+On the larger boards, nodes only expand into the candidate moves from
+Board.ordered_moves (wins, blocks, then the best cells near existing
+marks), which keeps the tree narrow enough to go deep.
+
+The tree is kept between turns. The next call starts from the node
+for the position the game has reached. With several workers, the
+calling process grows its own tree while each pool process grows one
+from the same root (root parallelization), and the root statistics are
+merged to pick the move. Pool processes are spawned rather than forked,
+since the GUI asks for moves from a thread, and never start pools of
+their own.
+
+    python mcts.py --board 7x7 --games 10 --budget-ms 1000
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import engine
+from engine import BOARD_SIZES, Board, geometry_for
+
+DRAW = "draw"
+# UCT exploration constant; sqrt(2) is the textbook value for 0..1 rewards
+EXPLORATION = 1.4
+# Rollouts between checks of the deadline and for cancellation
+CHECK_EVERY = 16
+# How often a parallel search checks for cancellation while it waits
+WAIT_S = 0.02
+# Worker processes for root parallelization (1 searches in-process)
+WORKERS = os.cpu_count() or 1
+
+
+class MCTSResult(namedtuple('MCTSResult', 'move playouts elapsed_ms visits win_rate')):
+    """Outcome of one MCTS move: the move, work done and its expected score"""
+
+    @property
+    def playouts_per_second(self):
+        """Rollouts per second of wall time across all workers"""
+        return self.playouts / self.elapsed_ms * 1000 if self.elapsed_ms else 0.0
+
+
+class Node:
+    """Position reached by player placing a mark on move"""
+
+    __slots__ = ('move', 'player', 'parent', 'children', 'untried',
+                 'outcome', 'visits', 'score')
+
+    def __init__(self, move, player, parent, outcome=None):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = []
+        # Moves not expanded yet, best candidate last; None until first visit
+        self.untried = None
+        # "X", "O" or DRAW once the game is over at this node
+        self.outcome = outcome
+        self.visits = 0
+        # Sum of rewards for player: 1 per win, 0.5 per draw
+        self.score = 0.0
+
+    def select(self, exploration):
+        """Child with the best UCT value"""
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.score / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+def other(player):
+    """The opponent of player"""
+    return "O" if player == "X" else "X"
+
+
+def rollout(board, player):
+    """Play out a position with player to move; return the winner or DRAW
+
+    Every move is undone before returning. A line can only be completed
+    on a threat cell, so quiet moves never need a win check.
+    """
+    cells = board.empty_cells()
+    random.shuffle(cells)
+    played = []
+    outcome = DRAW
+    next_cell = 0
+    while not board.is_board_full():
+        if board.threat_cells(player):
+            outcome = player
+            break
+        blocks = board.threat_cells(other(player))
+        if blocks:
+            cell = (blocks & -blocks).bit_length() - 1
+        else:
+            while not board.is_empty(cells[next_cell]):
+                next_cell += 1
+            cell = cells[next_cell]
+        board.make(cell, player)
+        played.append((cell, player))
+        player = other(player)
+    for cell, mark in reversed(played):
+        board.unmake(cell, mark)
+    return outcome
+
+
+class MCTS:
+    """UCT search whose tree survives from one move to the next"""
+
+    def __init__(self, geometry=engine.CLASSIC, exploration=EXPLORATION):
+        self.geometry = geometry
+        self.exploration = exploration
+        self.root = None
+        # Position of the root, to find it again on the next call
+        self.root_position = None
+
+    def reuse(self, board):
+        """Re-root the tree at board if it is at most two plies below the root"""
+        if self.root is None:
+            return None
+        position = (board.x, board.o)
+        if self.root_position == position:
+            return self.root
+        x, o = self.root_position
+        for child in self.root.children:
+            cx, co = (x | 1 << child.move, o) if child.player == "X" else (x, o | 1 << child.move)
+            if (cx, co) == position:
+                return child
+            for grandchild in child.children:
+                bit = 1 << grandchild.move
+                if (cx | bit, co) == position and grandchild.player == "X":
+                    return grandchild
+                if (cx, co | bit) == position and grandchild.player == "O":
+                    return grandchild
+        return None
+
+    def run(self, board, playouts=None, budget_ms=None):
+        """Grow the tree from board; return the number of playouts done"""
+        root = self.reuse(board)
+        if root is None:
+            root = Node(None, other(board.to_move()), None)
+        root.parent = None
+        self.root = root
+        self.root_position = (board.x, board.o)
+
+        board = board.copy()
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
+        token = engine.current_token()
+        exploration = self.exploration
+        done = 0
+        while playouts is None or done < playouts:
+            if not done % CHECK_EVERY:
+                if token.cancelled:
+                    raise engine.SearchCancelled
+                if deadline is not None and done and time.perf_counter() >= deadline:
+                    break
+
+            # Selection: follow UCT through fully expanded nodes
+            node = root
+            path = []
+            while node.outcome is None and node.untried == [] and node.children:
+                node = node.select(exploration)
+                board.make(node.move, node.player)
+                path.append(node)
+
+            # Expansion: add one child, unless the game is over here
+            if node.outcome is None:
+                to_move = other(node.player)
+                if node.untried is None:
+                    node.untried = board.ordered_moves(to_move)[::-1]
+                if node.untried:
+                    move = node.untried.pop()
+                    completed = board.make(move, to_move)
+                    outcome = to_move if completed else DRAW if board.is_board_full() else None
+                    child = Node(move, to_move, node, outcome)
+                    node.children.append(child)
+                    node = child
+                    path.append(node)
+
+            # Simulation
+            outcome = node.outcome
+            if outcome is None:
+                outcome = rollout(board, other(node.player))
+
+            # Backpropagation
+            while node is not None:
+                node.visits += 1
+                if outcome == node.player:
+                    node.score += 1
+                elif outcome == DRAW:
+                    node.score += 0.5
+                node = node.parent
+            for node in reversed(path):
+                board.unmake(node.move, node.player)
+            done += 1
+        return done
+
+    def root_stats(self):
+        """{move: (visits, score)} for the root's children"""
+        return {child.move: (child.visits, child.score) for child in self.root.children}
+
+    def best_move(self, board, playouts=None, budget_ms=engine.MOVE_BUDGET_MS,
+                  workers=1):
+        """Most visited move after growing the tree within the limits"""
+        start = time.perf_counter()
+        if board.is_board_full():
+            return MCTSResult(None, 0, 0.0, 0, 0.5)
+        # A process of some pool (the server's or our own) searches alone
+        if workers > 1 and multiprocessing.parent_process() is None:
+            done, stats = parallel_stats(self, board, playouts, budget_ms, workers)
+        else:
+            done = self.run(board, playouts, budget_ms)
+            stats = self.root_stats()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        move, (visits, score) = max(stats.items(), key=lambda item: item[1][0])
+        return MCTSResult(move, done, elapsed_ms, visits, score / visits)
+
+
+# Tree per board geometry in this process, built on first use
+_trees = {}
+_pool = None
+
+
+def tree_for(geometry):
+    """Return this process's shared MCTS for a board geometry"""
+    tree = _trees.get(geometry)
+    if tree is None:
+        tree = _trees[geometry] = MCTS(geometry)
+    return tree
+
+
+def worker_search(size, x, o, playouts, budget_ms, seed):
+    """Grow this worker's tree from a position; return (pid, playouts, root stats)"""
+    random.seed(seed)
+    geometry = geometry_for(size)
+    tree = tree_for(geometry)
+    done = tree.run(Board(x, o, geometry=geometry), playouts, budget_ms)
+    return os.getpid(), done, tree.root_stats()
+
+
+def parallel_stats(tree, board, playouts, budget_ms, workers):
+    """Root-parallel search with tree in this process plus workers - 1 pool processes
+
+    Return (playouts, merged stats). Cancelling the current token stops
+    the wait at once; pool processes finish their budget on their own.
+    """
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: Master is asked for from the GUI's worker
+        # thread, and forking a process with Tk and other threads running
+        # can leave the child holding locks no thread will release
+        _pool = ProcessPoolExecutor(max_workers=workers - 1,
+                                    mp_context=multiprocessing.get_context('spawn'))
+    size = board.geometry.name
+    share = None if playouts is None else -(-playouts // workers)
+    futures = [_pool.submit(worker_search, size, board.x, board.o, share, budget_ms,
+                            random.getrandbits(32))
+               for _ in range(workers - 1)]
+    # Our own tree is one of the workers, so it is still reused next turn
+    done = tree.run(board, share, budget_ms)
+    token = engine.current_token()
+    pending = set(futures)
+    while pending:
+        if token.cancelled:
+            raise engine.SearchCancelled
+        _, pending = wait(pending, timeout=WAIT_S, return_when=FIRST_COMPLETED)
+
+    # A worker that ran two of the tasks reports its tree twice; only its
+    # latest (largest) statistics count
+    by_worker = {'local': (None, tree.root_stats())}
+    for future in futures:
+        pid, count, stats = future.result()
+        done += count
+        total = sum(visits for visits, _ in stats.values())
+        if total >= by_worker.get(pid, (-1, None))[0]:
+            by_worker[pid] = (total, stats)
+
+    merged = {}
+    for _, stats in by_worker.values():
+        for move, (visits, score) in stats.items():
+            seen_visits, seen_score = merged.get(move, (0, 0.0))
+            merged[move] = (seen_visits + visits, seen_score + score)
+    return done, merged
+
+
+def mcts_move(board, playouts=None, budget_ms=engine.MOVE_BUDGET_MS, workers=None):
+    """Master mode - the move MCTS finds within the budget"""
+    tree = tree_for(board.geometry)
+    return tree.best_move(board, playouts, budget_ms, workers or WORKERS).move
+
+
+def play_match(size, games, playouts, budget_ms, workers):
+    """MCTS against the Hard search, alternating who starts; print results"""
+    geometry = geometry_for(size)
+    standard = engine.new_searches(geometry)[0]
+    tally = {'mcts': 0, 'minimax': 0, DRAW: 0}
+    rates = []
+    for game in range(games):
+        board = Board(geometry=geometry)
+        tree = MCTS(geometry)
+        mcts_player = "XO"[game % 2]
+        while not board.is_board_full():
+            player = board.to_move()
+            if player == mcts_player:
+                result = tree.best_move(board, playouts, budget_ms, workers)
+                rates.append(result.playouts_per_second)
+                move = result.move
+            else:
+                move = standard.best_move(board, player == "O", budget_ms).move
+            if board.make(move, player):
+                tally['mcts' if player == mcts_player else 'minimax'] += 1
+                break
+        else:
+            tally[DRAW] += 1
+        print(f"game {game + 1}: MCTS as {mcts_player}, "
+              f"MCTS {tally['mcts']} / minimax {tally['minimax']} / draws {tally[DRAW]}")
+    rates.sort()
+    print(f"{size}: {sum(rates) / len(rates):,.0f} playouts/s on average, "
+          f"{rates[len(rates) // 2]:,.0f} median")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--board', choices=list(BOARD_SIZES), default="7x7")
+    parser.add_argument('--games', type=int, default=4)
+    parser.add_argument('--playouts', type=int, help="playouts per move (default: time)")
+    parser.add_argument('--budget-ms', type=float, default=engine.MOVE_BUDGET_MS,
+                        help="time per move for both sides")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+    play_match(args.board, args.games, args.playouts, args.budget_ms, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Optional instrumentation for the game loop and the searches
+
+Everything here is off by default. While disabled, instrumented code
+pays one attribute check per call and records nothing. Turn it on with
+environment variables before starting the game:
+
+    XO_METRICS=-             print metrics when the game exits
+    XO_METRICS=metrics.json  write them to a JSON file instead
+    XO_PROFILE=moves.prof    also run every computer move under cProfile
+
+or from code with enable(). Counters are plain integers and latencies go
+into fixed-bucket histograms, so recording stays cheap even when enabled.
+"""
+import atexit
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from functools import wraps
+
+# Checked by every instrumented call site before doing any work
+enabled = False
+# Where report() sends metrics: a path, or "-" for stdout
+output = None
+# Where the merged cProfile stats of profiled moves are dumped, if anywhere
+profile_path = None
+
+# Upper bucket bounds in ms; anything slower lands in the last bucket
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+              1000, 2500, float('inf'))
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_profiles = []
+# name -> callable returning a dict, read when metrics are exported
+_sources = {}
+
+
+class Histogram:
+    """Latency distribution over BUCKETS_MS"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        """Add one sample"""
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        rank = fraction * self.total
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max_ms)
+        return 0.0
+
+    def summary(self):
+        """Return count, mean, p50/p90/p99, max and bucket counts as a dict"""
+        return {
+            'count': self.total,
+            'mean_ms': self.sum_ms / self.total if self.total else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max_ms,
+            'buckets': {f"<={bound}": count
+                        for bound, count in zip(BUCKETS_MS, self.counts) if count},
+        }
+
+
+def enable(to=None, profile_to=None):
+    """Start recording; report to path (or "-" for stdout) at exit"""
+    global enabled, output, profile_path
+    if not enabled and to is not None:
+        atexit.register(report)
+    enabled = True
+    output = to
+    profile_path = profile_to
+
+
+def disable():
+    """Stop recording; what was collected so far is kept"""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forget every counter, histogram and profile"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _profiles.clear()
+
+
+def count(name, amount=1):
+    """Add amount to a counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, ms):
+    """Record one latency sample in milliseconds"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.record(ms)
+
+
+def timed(name):
+    """Decorator recording the wall time of every call under name"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorate
+
+
+def profiled(func, *args):
+    """Call func(*args), under cProfile when a profile path is set"""
+    if not enabled or profile_path is None:
+        return func(*args)
+    # Imported here: pstats alone costs a headless start tens of ms
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args)
+    finally:
+        with _lock:
+            _profiles.append(profile)
+
+
+def add_source(name, stats):
+    """Include the dict returned by stats() under name in every export"""
+    _sources[name] = stats
+
+
+def snapshot():
+    """Return everything recorded so far as a JSON-ready dict"""
+    with _lock:
+        result = {
+            'counters': dict(sorted(_counters.items())),
+            'latency': {name: histogram.summary()
+                        for name, histogram in sorted(_histograms.items())},
+        }
+    for name, stats in _sources.items():
+        result[name] = stats()
+    return result
+
+
+def dump_profile(path):
+    """Merge the profiled moves into one pstats file; return how many"""
+    with _lock:
+        profiles = list(_profiles)
+    if profiles:
+        import pstats
+
+        pstats.Stats(*profiles).dump_stats(path)
+    return len(profiles)
+
+
+def report():
+    """Send the snapshot to the configured output and dump any profile"""
+    if output is None:
+        return
+    data = json.dumps(snapshot(), indent=2)
+    if output == "-":
+        print(data)
+    else:
+        with open(output, "w") as f:
+            f.write(data)
+    if profile_path is not None:
+        moves = dump_profile(profile_path)
+        print(f"Profiled {moves} moves into {profile_path}", file=sys.stderr)
+
+
+if os.environ.get("XO_METRICS") or os.environ.get("XO_PROFILE"):
+    enable(os.environ.get("XO_METRICS") or "-", os.environ.get("XO_PROFILE"))
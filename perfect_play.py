@@ -0,0 +1,131 @@
+"""Precomputed perfect-play table stored as a memory-mapped binary file
+
+Every position with legal piece counts is solved once for both the Hard
+(standard) and Impossible (killer) scorings. Records are laid out by the
+base-3 encoding of the position, so a lookup is a single unpack at a
+fixed offset. Generate the file with:
+
+    python perfect_play.py [path]
+"""
+import mmap
+import os
+import struct
+import sys
+
+import engine
+from engine import CELLS, KILLER, STANDARD, Board
+
+MAGIC = b"XOPT"
+VERSION = 1
+# magic, version, record size, record count
+HEADER = struct.Struct("<4sHHI")
+# standard score, killer score, Hard move, Impossible move
+RECORD = struct.Struct("<hhBB")
+NO_MOVE = 255
+POSITIONS = 3 ** CELLS
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "xo_perfect.bin")
+
+# Base-3 weight of every 9-bit player board (X counts 1, O counts 2)
+BASE3 = tuple(sum(3 ** cell for cell in range(CELLS) if bits >> cell & 1)
+              for bits in range(1 << CELLS))
+
+
+def position_index(x, o):
+    """Base-3 index of a position: digit 0 empty, 1 X, 2 O per cell"""
+    return BASE3[x] + 2 * BASE3[o]
+
+
+def legal_positions():
+    """Yield (index, x, o) for every position with legal piece counts"""
+    for index in range(POSITIONS):
+        x = o = 0
+        rest = index
+        for cell in range(CELLS):
+            rest, digit = divmod(rest, 3)
+            if digit == 1:
+                x |= 1 << cell
+            elif digit == 2:
+                o |= 1 << cell
+        x_count = bin(x).count("1")
+        o_count = bin(o).count("1")
+        if x_count == o_count or x_count == o_count + 1:
+            yield index, x, o
+
+
+def build():
+    """Solve every legal position; return (table bytes, positions solved)"""
+    empty = RECORD.pack(0, 0, NO_MOVE, NO_MOVE)
+    data = bytearray(HEADER.pack(MAGIC, VERSION, RECORD.size, POSITIONS))
+    data += empty * POSITIONS
+
+    solved = 0
+    for index, x, o in legal_positions():
+        board = Board(x, o)
+        is_maximizing = board.to_move() == "O"
+        # No time budget: the table must hold fully searched answers
+        hard = engine.search_best_move(board, budget_ms=None)
+        impossible = engine.search_impossible_move(board, budget_ms=None)
+        RECORD.pack_into(data, HEADER.size + RECORD.size * index,
+                         STANDARD.value(x, o, is_maximizing),
+                         KILLER.value(x, o, is_maximizing),
+                         NO_MOVE if hard is None else hard,
+                         NO_MOVE if impossible is None else impossible)
+        solved += 1
+    return data, solved
+
+
+def generate(path=DEFAULT_PATH):
+    """Solve every legal position and write the table to path"""
+    data, solved = build()
+    with open(path, "wb") as f:
+        f.write(data)
+    return solved
+
+
+class PerfectTable:
+    """Read-only view of a generated table through mmap"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, count = HEADER.unpack_from(self.map, 0)
+        if (magic != MAGIC or version != VERSION or record_size != RECORD.size
+                or count != POSITIONS
+                or len(self.map) != HEADER.size + RECORD.size * POSITIONS):
+            self.map.close()
+            raise ValueError(f"{path} is not a perfect-play table")
+
+    def record(self, board):
+        """Return (standard, killer, hard move, impossible move) for board"""
+        offset = HEADER.size + RECORD.size * position_index(board.x, board.o)
+        return RECORD.unpack_from(self.map, offset)
+
+    def standard_score(self, board):
+        """Standard minimax value of board for the side to move"""
+        return self.record(board)[0]
+
+    def killer_score(self, board):
+        """Killer minimax value of board for the side to move"""
+        return self.record(board)[1]
+
+    def hard_move(self, board):
+        """Precomputed Hard mode move"""
+        move = self.record(board)[2]
+        return None if move == NO_MOVE else move
+
+    def impossible_move(self, board):
+        """Precomputed Impossible mode move"""
+        move = self.record(board)[3]
+        return None if move == NO_MOVE else move
+
+    def close(self):
+        """Release the mapping"""
+        self.map.close()
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    count = generate(target)
+    print(f"Solved {count} positions into {target}")
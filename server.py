@@ -0,0 +1,518 @@
+"""Headless XO game server over HTTP and WebSocket
+
+Serves any number of concurrent games from one asyncio loop using only
+the standard library. Each session follows the same rules as the Tk
+window, including Impossible mode never crediting the player with a
+win. Easy, Medium and table lookups are answered on the loop. Hard,
+Impossible and Master searches go to a process pool. Every session shares one
+position cache, and identical positions that are already being searched
+wait for that result instead of starting a second search.
+
+HTTP API (JSON bodies):
+    POST   /sessions             {"level": "Hard", "size": "3x3"}
+    GET    /sessions/<id>
+    POST   /sessions/<id>/move   {"cell": 4} or {"row": 1, "col": 1}
+    DELETE /sessions/<id>
+    GET    /stats
+
+WebSocket at /ws: send {"op": "new" | "move" | "state", ...} with the
+same fields as above and receive the session state after each message.
+
+    python server.py --port 8765 --workers 4 --game-log games.log
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+import gamelog
+import metrics
+from engine import BOARD_SIZES, CLASSIC, Board, STRATEGIES, geometry_for
+
+# Levels whose searches are worth shipping to another process
+POOLED_LEVELS = ('Hard', 'Impossible', 'Master')
+# Levels answered from the perfect-play table on 3x3 when it exists
+TABLE_LEVELS = ('Hard', 'Impossible')
+# Sessions untouched for this long are dropped
+SESSION_TTL_S = 600
+MAX_BODY = 1 << 16
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+
+WON = "won"
+LOST = "lost"
+DRAW = "draw"
+PLAYING = "playing"
+LOGGED_OUTCOMES = {WON: gamelog.X_WON, LOST: gamelog.O_WON, DRAW: gamelog.DRAW}
+
+
+class HTTPError(Exception):
+    """Error that becomes an HTTP status and a JSON message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def init_worker():
+    """Process pool initializer: map the perfect-play table once per worker"""
+    engine.load_perfect_table()
+
+
+def pooled_move(level, size, x, o):
+    """Compute a move in a worker process from a plain position"""
+    board = Board(x, o, geometry=geometry_for(size))
+    return STRATEGIES[level](board)
+
+
+class PositionCache:
+    """Bounded LRU map from (level, geometry, x, o) to the computer's move"""
+
+    def __init__(self, max_size=1 << 18):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached move, or None"""
+        move = self.entries.get(key)
+        if move is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return move
+
+    def put(self, key, move):
+        """Remember a move, evicting the least recently used one"""
+        self.entries[key] = move
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """Return hit/miss counters as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class Session:
+    """One player's game against one difficulty level"""
+
+    __slots__ = ('id', 'level', 'size', 'board', 'moves', 'status', 'last_move',
+                 'touched', 'busy')
+
+    def __init__(self, session_id, level, size):
+        self.id = session_id
+        self.level = level
+        self.size = size
+        self.board = Board(geometry=geometry_for(size))
+        # Cells played so far, X first, for the game log
+        self.moves = []
+        self.status = PLAYING
+        self.last_move = None
+        self.touched = time.monotonic()
+        # Set while the computer is thinking, so moves cannot interleave
+        self.busy = False
+
+    def state(self):
+        """Return the session as a JSON-ready dict"""
+        geometry = self.board.geometry
+        return {
+            'id': self.id,
+            'level': self.level,
+            'size': self.size,
+            'k': geometry.k,
+            'cells': "".join(self.board.get(cell) or "." for cell in range(geometry.cells)),
+            'status': self.status,
+            'computer_move': self.last_move,
+        }
+
+
+class GameServer:
+    """Sessions, the shared position cache and the search process pool"""
+
+    def __init__(self, workers=None, cache_size=1 << 18, game_log=None):
+        self.sessions = {}
+        self.game_log = game_log
+        self.ids = itertools.count(1)
+        self.cache = PositionCache(cache_size)
+        # Searches in flight, so equal positions are only searched once
+        self.pending = {}
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        self.requests = 0
+        self.started = time.monotonic()
+        engine.load_perfect_table()
+
+    def session(self, session_id):
+        """Look up a live session or raise a 404"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"no session {session_id}")
+        session.touched = time.monotonic()
+        return session
+
+    def create(self, level="Medium", size="3x3"):
+        """Start a new game with the player (X) to move"""
+        if not isinstance(level, str) or level not in STRATEGIES:
+            raise HTTPError(400, f"unknown level {level!r}")
+        if not isinstance(size, str) or size not in BOARD_SIZES:
+            raise HTTPError(400, f"unknown size {size!r}")
+        session = Session(str(next(self.ids)), level, size)
+        self.sessions[session.id] = session
+        return session
+
+    async def computer_move(self, level, board):
+        """The computer's reply, from the cache, the loop or the pool"""
+        geometry = board.geometry
+        if level not in POOLED_LEVELS:
+            return STRATEGIES[level](board)
+        if (level in TABLE_LEVELS and engine.perfect_table is not None
+                and geometry == CLASSIC):
+            return STRATEGIES[level](board)
+
+        key = (level, geometry, board.x, board.o)
+        move = self.cache.get(key)
+        if move is not None:
+            return move
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.pool, pooled_move, level,
+                geometry.name, board.x, board.o)
+            self.pending[key] = future
+            future.add_done_callback(lambda done: self.search_done(key, done))
+        # A dropped connection must not cancel a search others wait on
+        return await asyncio.shield(future)
+
+    def search_done(self, key, future):
+        """Cache a finished pooled search"""
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            move = future.result()
+            if move is not None:
+                self.cache.put(key, move)
+
+    async def play(self, session, cell):
+        """Apply the player's move and the computer's reply, like the GUI"""
+        board = session.board
+        if session.status != PLAYING:
+            raise HTTPError(409, "game is over")
+        if session.busy:
+            raise HTTPError(409, "computer is still thinking")
+        if not 0 <= cell < board.geometry.cells or not board.is_empty(cell):
+            raise HTTPError(400, f"cell {cell} is not free")
+        session.last_move = None
+        session.busy = True
+        try:
+            await self.take_turn(session, cell)
+        finally:
+            session.busy = False
+            if (self.sessions.get(session.id) is not session
+                    and session.status == PLAYING and session.moves):
+                # Dropped while the computer was thinking; drop left the log to us
+                self.log_game(session, gamelog.ABANDONED)
+        if session.status != PLAYING:
+            self.log_game(session, LOGGED_OUTCOMES[session.status])
+
+    def log_game(self, session, outcome):
+        """Append a session's game to the game log, if there is one"""
+        if self.game_log is not None:
+            self.game_log.append(session.level, session.size, outcome, session.moves)
+
+    def drop(self, session):
+        """Forget a session, logging it as abandoned if it was mid-game
+
+        A session dropped twice is only logged once, and one dropped in the
+        middle of a turn is logged by play when the turn finishes.
+        """
+        if self.sessions.get(session.id) is not session:
+            return
+        del self.sessions[session.id]
+        if session.busy:
+            return
+        if session.status == PLAYING and session.moves:
+            self.log_game(session, gamelog.ABANDONED)
+
+    async def take_turn(self, session, cell):
+        """Player's move, then the computer's reply unless the game ended"""
+        board = session.board
+        board.make(cell, "X")
+        session.moves.append(cell)
+        if board.player_won(session.level):
+            session.status = WON
+            return
+        if board.is_board_full():
+            session.status = DRAW
+            return
+
+        start = time.perf_counter()
+        try:
+            move = await self.computer_move(session.level, board)
+        except BaseException:
+            # Failed or cancelled: take the move back so the player can
+            # retry it, rather than leaving X to move twice in a row
+            board.unmake(cell, "X")
+            session.moves.pop()
+            raise
+        if metrics.enabled:
+            metrics.observe(f"server.move.{session.level}",
+                            (time.perf_counter() - start) * 1000)
+        if move is None:
+            return
+        board.make(move, "O")
+        session.moves.append(move)
+        session.last_move = move
+        if board.check_winner("O"):
+            session.status = LOST
+        elif board.is_board_full():
+            session.status = DRAW
+
+    async def handle(self, method, path, body):
+        """Route one API call; return (status, JSON-ready result)"""
+        self.requests += 1
+        parts = path.strip("/").split("/")
+        if parts == ["stats"] and method == "GET":
+            return 200, self.stats()
+        if parts == ["sessions"] and method == "POST":
+            session = self.create(body.get('level', "Medium"), body.get('size', "3x3"))
+            return 201, session.state()
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session = self.session(parts[1])
+            if len(parts) == 2 and method == "GET":
+                return 200, session.state()
+            if len(parts) == 2 and method == "DELETE":
+                self.drop(session)
+                return 200, {'deleted': session.id}
+            if parts[2:] == ["move"] and method == "POST":
+                await self.play(session, self.cell_of(session, body))
+                return 200, session.state()
+        raise HTTPError(404, f"no route for {method} {path}")
+
+    @staticmethod
+    def cell_of(session, body):
+        """Cell index from {"cell": n} or {"row": r, "col": c}"""
+        try:
+            if 'cell' in body:
+                return int(body['cell'])
+            return session.board.geometry.cell_index(int(body['row']), int(body['col']))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPError(400, "move needs cell, or row and col") from None
+
+    def stats(self):
+        """Server counters as a dict"""
+        uptime = time.monotonic() - self.started
+        result = {
+            'sessions': len(self.sessions),
+            'requests': self.requests,
+            'requests_per_second': self.requests / uptime if uptime else 0.0,
+            'searches_in_flight': len(self.pending),
+            'position_cache': self.cache.stats(),
+        }
+        if metrics.enabled:
+            result['metrics'] = metrics.snapshot()
+        return result
+
+    async def expire_sessions(self):
+        """Drop idle sessions every minute"""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - SESSION_TTL_S
+            for session in [s for s in self.sessions.values()
+                            if s.touched < cutoff and not s.busy]:
+                self.drop(session)
+
+    # --- HTTP --------------------------------------------------------------
+
+    async def serve_connection(self, reader, writer):
+        """Answer requests on one keep-alive connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = await read_headers(reader)
+                if headers.get('upgrade', "").lower() == "websocket":
+                    await self.serve_websocket(reader, writer, headers)
+                    break
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    await write_response(writer, 413, {'error': "body too large"})
+                    break
+                raw = await reader.readexactly(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else {}
+                    if not isinstance(body, dict):
+                        raise HTTPError(400, "body must be a JSON object")
+                    status, result = await self.handle(method, path, body)
+                except HTTPError as error:
+                    status, result = error.status, {'error': str(error)}
+                except json.JSONDecodeError:
+                    status, result = 400, {'error': "invalid JSON"}
+                await write_response(writer, status, result)
+                if headers.get('connection', "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # --- WebSocket ---------------------------------------------------------
+
+    async def serve_websocket(self, reader, writer, headers):
+        """Play games over one WebSocket; the connection owns one session"""
+        key = headers.get('sec-websocket-key', "").encode()
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+
+        session = None
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == 0x8:
+                    writer.write(encode_frame(0x8, payload[:2]))
+                    break
+                if opcode == 0x9:
+                    writer.write(encode_frame(0xA, payload))
+                    continue
+                if opcode != 0x1:
+                    continue
+                self.requests += 1
+                try:
+                    message = json.loads(payload)
+                    op = message.get('op')
+                    if op == "new":
+                        if session is not None:
+                            self.drop(session)
+                        session = self.create(message.get('level', "Medium"),
+                                              message.get('size', "3x3"))
+                    elif session is None:
+                        raise HTTPError(409, "send op new first")
+                    elif op == "move":
+                        await self.play(session, self.cell_of(session, message))
+                    elif op != "state":
+                        raise HTTPError(400, f"unknown op {op!r}")
+                    reply = session.state()
+                except HTTPError as error:
+                    reply = {'error': str(error), 'status_code': error.status}
+                except (json.JSONDecodeError, AttributeError):
+                    reply = {'error': "messages must be JSON objects", 'status_code': 400}
+                writer.write(encode_frame(0x1, json.dumps(reply).encode()))
+                await writer.drain()
+        finally:
+            if session is not None:
+                self.drop(session)
+
+    def close(self):
+        """Stop the process pool"""
+        self.pool.shutdown(cancel_futures=True)
+
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+               409: "Conflict", 413: "Payload Too Large"}
+
+
+async def read_headers(reader):
+    """Read header lines up to the blank line; return them lowercased"""
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+async def write_response(writer, status, result):
+    """Send one JSON response, keeping the connection open"""
+    body = json.dumps(result).encode()
+    writer.write((f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                  "Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+
+
+async def read_frame(reader):
+    """Read one WebSocket frame; return (opcode, unmasked payload)"""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack("!Q", await reader.readexactly(8))
+    if length > MAX_BODY:
+        raise ValueError("frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+    payload = await reader.readexactly(length)
+    payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def encode_frame(opcode, payload, mask=None):
+    """Build one final WebSocket frame; clients must pass a 4-byte mask"""
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack("!H", length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack("!Q", length)
+    if mask:
+        header += mask
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return header + payload
+
+
+async def serve(host, port, workers=None, log_path=None):
+    """Run the server until cancelled"""
+    game_log = gamelog.GameLog(log_path) if log_path else None
+    game_server = GameServer(workers, game_log=game_log)
+    server = await asyncio.start_server(game_server.serve_connection, host, port,
+                                        backlog=4096)
+    expiry = asyncio.create_task(game_server.expire_sessions())
+    print(f"Serving XO on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        expiry.cancel()
+        game_server.close()
+        if game_log is not None:
+            game_log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="search processes for Hard, Impossible and Master")
+    parser.add_argument('--game-log', help="append finished games to this game log")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.game_log))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Vectorized batch self-play between the computer strategies
+
+Boards are NumPy arrays of shape (N, cells) holding 1 for X, -1 for O
+and 0 for empty. Every game in a batch moves at once: policies pick a
+cell per row, and wins are found with one matrix product against the
+(cells, lines) line-mask matrix. Hard and Impossible read their moves
+from the perfect-play table, so they only run on the 3x3 board.
+
+    python simulate.py --games 1000000
+    python simulate.py --games 200000 --x Easy --o Medium --block-chance 0.5
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+import engine
+import perfect_play
+from engine import BOARD_SIZES, CLASSIC, Geometry
+
+X = 1
+O = -1
+
+# Record layout of perfect_play.RECORD as a NumPy dtype
+RECORD_DTYPE = np.dtype([('standard', '<i2'), ('killer', '<i2'),
+                         ('hard', 'u1'), ('impossible', 'u1')])
+
+# The records, once loaded; solving them without the file takes a second
+_table_records = None
+
+
+def line_matrix(geometry):
+    """(cells, lines) 0/1 matrix: column j marks the cells of line j"""
+    matrix = np.zeros((geometry.cells, len(geometry.lines)), dtype=np.float32)
+    for j, line in enumerate(geometry.lines):
+        matrix[list(line), j] = 1
+    return matrix
+
+
+def first_true(mask):
+    """Index of the first True per row (rows without one give 0)"""
+    return mask.argmax(axis=1)
+
+
+def random_policy(boards, side, rng, lines):
+    """Easy - a uniformly random empty cell per board"""
+    noise = rng.random(boards.shape, dtype=np.float32)
+    noise[boards != 0] = -1
+    return noise.argmax(axis=1)
+
+
+def completing_cells(boards, side, lines, k):
+    """(N, cells) mask of empty cells that finish a line for side"""
+    empty = (boards == 0).astype(np.float32)
+    mine = (boards == side).astype(np.float32) @ lines
+    open_cells = empty @ lines
+    ready = ((mine == k - 1) & (open_cells == 1)).astype(np.float32)
+    return ((ready @ lines.T) > 0) & (boards == 0)
+
+
+def medium_policy(block_chance=engine.MEDIUM_BLOCK_CHANCE):
+    """Medium - win if possible, block with block_chance, else random"""
+    def policy(boards, side, rng, lines):
+        k = int(lines.sum(axis=0)[0])
+        moves = random_policy(boards, side, rng, lines)
+        blocks = completing_cells(boards, -side, lines, k)
+        can_block = blocks.any(axis=1) & (rng.random(len(boards)) < block_chance)
+        moves = np.where(can_block, first_true(blocks), moves)
+        wins = completing_cells(boards, side, lines, k)
+        return np.where(wins.any(axis=1), first_true(wins), moves)
+    return policy
+
+
+def load_table_records():
+    """Perfect-play records as a NumPy array, from disk or solved in memory
+
+    Loaded once per process and shared by every pairing that needs them.
+    """
+    global _table_records
+    if _table_records is not None:
+        return _table_records
+    if os.path.exists(perfect_play.DEFAULT_PATH):
+        _table_records = np.memmap(perfect_play.DEFAULT_PATH, dtype=RECORD_DTYPE,
+                                   mode='r', offset=perfect_play.HEADER.size,
+                                   shape=(perfect_play.POSITIONS,))
+    else:
+        data, _ = perfect_play.build()
+        _table_records = np.frombuffer(bytes(data), dtype=RECORD_DTYPE,
+                                       offset=perfect_play.HEADER.size)
+    return _table_records
+
+
+def table_policy(field):
+    """Hard or Impossible - the precomputed move for the position
+
+    The table holds O's move for every position, so X looks its move up
+    with the colors swapped.
+    """
+    records = load_table_records()
+    moves = np.ascontiguousarray(records[field]).astype(np.int64)
+    powers = 3 ** np.arange(CLASSIC.cells, dtype=np.int64)
+
+    def policy(boards, side, rng, lines):
+        index = (boards == -side) @ powers + 2 * ((boards == side) @ powers)
+        return moves[index]
+    return policy
+
+
+# Levels with a vectorized policy; Master's tree search has none
+LEVELS = ('Easy', 'Medium', 'Hard', 'Impossible')
+
+
+def make_policy(name, block_chance=engine.MEDIUM_BLOCK_CHANCE):
+    """Vectorized policy for a difficulty level name"""
+    if name == 'Easy':
+        return random_policy
+    if name == 'Medium':
+        return medium_policy(block_chance)
+    if name == 'Hard':
+        return table_policy('hard')
+    if name == 'Impossible':
+        return table_policy('impossible')
+    raise ValueError(f"Unknown strategy {name!r}")
+
+
+def play_batch(x_policy, o_policy, games, geometry, rng):
+    """Play games at once; return counts of (X wins, draws, O wins)"""
+    lines = line_matrix(geometry)
+    boards = np.zeros((games, geometry.cells), dtype=np.int8)
+    active = np.arange(games)
+    x_wins = o_wins = 0
+
+    for ply in range(geometry.cells):
+        if not len(active):
+            break
+        side = X if ply % 2 == 0 else O
+        policy = x_policy if side == X else o_policy
+        live = boards[active]
+        moves = policy(live, side, rng, lines)
+        live[np.arange(len(active)), moves] = side
+        boards[active] = live
+
+        won = (((live == side).astype(np.float32) @ lines) == geometry.k).any(axis=1)
+        if side == X:
+            x_wins += int(won.sum())
+        else:
+            o_wins += int(won.sum())
+        active = active[~won]
+
+    return x_wins, games - x_wins - o_wins, o_wins
+
+
+def simulate(x_name, o_name, games, geometry=CLASSIC, batch_size=250_000,
+             seed=None, block_chance=engine.MEDIUM_BLOCK_CHANCE):
+    """Play x_name (moving first) against o_name; return a result dict"""
+    if geometry != CLASSIC and {x_name, o_name} & {'Hard', 'Impossible'}:
+        raise ValueError("Hard and Impossible are only tabulated for 3x3")
+    rng = np.random.default_rng(seed)
+    x_policy = make_policy(x_name, block_chance)
+    o_policy = make_policy(o_name, block_chance)
+
+    start = time.perf_counter()
+    totals = [0, 0, 0]
+    remaining = games
+    while remaining:
+        batch = min(batch_size, remaining)
+        for i, count in enumerate(play_batch(x_policy, o_policy, batch, geometry, rng)):
+            totals[i] += count
+        remaining -= batch
+    elapsed = time.perf_counter() - start
+
+    x_wins, draws, o_wins = totals
+    return {
+        'x': x_name,
+        'o': o_name,
+        'games': games,
+        'x_win_rate': x_wins / games,
+        'draw_rate': draws / games,
+        'o_win_rate': o_wins / games,
+        'games_per_second': games / elapsed if elapsed else float('inf'),
+    }
+
+
+def main(argv=None):
+    """Run every requested pairing and print a results table"""
+    levels = list(LEVELS)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=100_000,
+                        help="games per pairing")
+    parser.add_argument('--x', choices=levels, action='append',
+                        help="strategy for X, who moves first (repeatable)")
+    parser.add_argument('--o', choices=levels, action='append',
+                        help="strategy for O (repeatable)")
+    parser.add_argument('--board', choices=list(BOARD_SIZES), default='3x3')
+    parser.add_argument('--block-chance', type=float,
+                        default=engine.MEDIUM_BLOCK_CHANCE,
+                        help="how often Medium blocks an open line")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    geometry = Geometry(*BOARD_SIZES[args.board])
+    usable = levels if geometry == CLASSIC else ['Easy', 'Medium']
+    print(f"{'X':<11}{'O':<11}{'X wins':>9}{'draws':>9}{'O wins':>9}{'games/s':>13}")
+    for x_name in args.x or usable:
+        for o_name in args.o or usable:
+            result = simulate(x_name, o_name, args.games, geometry,
+                              seed=args.seed, block_chance=args.block_chance)
+            print(f"{x_name:<11}{o_name:<11}"
+                  f"{result['x_win_rate']:>9.2%}{result['draw_rate']:>9.2%}"
+                  f"{result['o_win_rate']:>9.2%}{result['games_per_second']:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Regression gate of bench.py"""
+import bench
+
+
+def test_small_metrics_regress_like_large_ones():
+    baseline = {
+        "3x3 near terminal / medium_move": {'p50_ms': 0.0015, 'p99_ms': 0.0019},
+        "3x3 near terminal / primitives": {'is_board_full_ns': 71.0},
+        "3x3 empty / minimax": {'p50_ms': 6.0, 'nodes_per_move': 599},
+    }
+    doubled = {name: {metric: value * 2 for metric, value in metrics.items()}
+               for name, metrics in baseline.items()}
+    flagged = {(name, metric) for name, metric, _, _ in bench.compare(doubled, baseline, 0.3)}
+    assert flagged == {(name, metric) for name, metrics in baseline.items() for metric in metrics}
+
+
+def test_slowdowns_within_the_threshold_pass():
+    baseline = {"3x3 near terminal / medium_move": {'p50_ms': 0.0015}}
+    current = {"3x3 near terminal / medium_move": {'p50_ms': 0.0019}}
+    assert bench.compare(current, baseline, 0.3) == []
@@ -0,0 +1,97 @@
+"""Symmetry-aware transposition table for the minimax searches"""
+from collections import OrderedDict
+
+# Bound types stored with each score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def symmetry_maps(size=3):
+    """Bit permutation tables for the 8 rotations and reflections of the board"""
+    def transforms(r, c):
+        n = size - 1
+        return [(r, c), (c, n - r), (n - r, n - c), (n - c, r),
+                (r, n - c), (n - r, c), (c, r), (n - c, n - r)]
+
+    cells = size * size
+    # For each symmetry, where every source cell ends up
+    targets = [[0] * cells for _ in range(8)]
+    for cell in range(cells):
+        r, c = divmod(cell, size)
+        for k, (tr, tc) in enumerate(transforms(r, c)):
+            targets[k][cell] = tr * size + tc
+
+    maps = []
+    for target in targets:
+        table = [0] * (1 << cells)
+        for bits in range(1 << cells):
+            mapped = 0
+            for cell in range(cells):
+                if bits & (1 << cell):
+                    mapped |= 1 << target[cell]
+            table[bits] = mapped
+        maps.append(tuple(table))
+    return tuple(maps)
+
+
+SYMMETRY_MAPS = symmetry_maps()
+
+
+def canonical_key(x, o, is_maximizing):
+    """Smallest encoding of the position over all 8 board symmetries"""
+    key = min((m[x] << 9) | m[o] for m in SYMMETRY_MAPS)
+    return (key << 1) | is_maximizing
+
+
+class TranspositionTable:
+    """Bounded LRU map from canonical position to (score, depth, bound)"""
+
+    def __init__(self, max_size=1 << 16):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def probe(self, key, depth):
+        """Return the stored entry if it was searched at least depth plies"""
+        entry = self.entries.get(key)
+        if entry is None or entry[1] < depth:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key, score, depth, bound=EXACT):
+        """Record a search result, evicting the least recently used entry"""
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            # Keep a deeper result rather than overwrite it with a shallower one
+            if entries[key][1] > depth:
+                return
+        elif len(entries) >= self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = (score, depth, bound)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
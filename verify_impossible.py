@@ -0,0 +1,134 @@
+"""Exhaustive check of the Impossible mode guarantee
+
+Plays every possible sequence of player (X) moves against
+engine.impossible_move and lists each line where X completes a row or
+the game ends in a draw. Each first move is explored in its own worker
+process, and positions reached by several move orders are only
+explored once per worker.
+
+    python verify_impossible.py            # check the search
+    python verify_impossible.py --table    # check the perfect-play table
+
+Exits with status 1 if X can ever win (or, with --strict, draw), so it
+can run as a regression check whenever the AI changes.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from engine import CLASSIC, Board
+
+X_WINS = "X wins"
+DRAW = "draw"
+
+
+class Outcome:
+    """Leaf counts and the non-losing lines below one position"""
+
+    def __init__(self):
+        self.x_wins = 0
+        self.draws = 0
+        self.o_wins = 0
+        # (result, moves) for every line ending in an X win or a draw
+        self.lines = []
+
+    def add(self, other, prefix):
+        """Fold in the outcome of a child reached by the moves in prefix"""
+        self.x_wins += other.x_wins
+        self.draws += other.draws
+        self.o_wins += other.o_wins
+        self.lines += [(result, prefix + moves) for result, moves in other.lines]
+
+
+def explore(board, memo):
+    """Outcome of every X strategy from a position with X to move"""
+    key = (board.x, board.o)
+    if key in memo:
+        return memo[key]
+
+    outcome = Outcome()
+    for cell in board.empty_cells():
+        board.make(cell, "X")
+        if board.check_winner("X"):
+            outcome.x_wins += 1
+            outcome.lines.append((X_WINS, [cell]))
+        elif board.is_board_full():
+            outcome.draws += 1
+            outcome.lines.append((DRAW, [cell]))
+        else:
+            reply = engine.impossible_move(board)
+            board.make(reply, "O")
+            if board.check_winner("O"):
+                outcome.o_wins += 1
+            elif board.is_board_full():
+                outcome.draws += 1
+                outcome.lines.append((DRAW, [cell, reply]))
+            else:
+                outcome.add(explore(board, memo), [cell, reply])
+            board.unmake(reply, "O")
+        board.unmake(cell, "X")
+
+    memo[key] = outcome
+    return outcome
+
+
+def verify_opening(cell, use_table):
+    """Explore every game that starts with X on cell (runs in a worker)"""
+    if use_table and engine.load_perfect_table() is None:
+        raise SystemExit("No perfect-play table; run perfect_play.py first")
+    board = Board()
+    root = Outcome()
+    board.make(cell, "X")
+    reply = engine.impossible_move(board)
+    board.make(reply, "O")
+    root.add(explore(board, {}), [cell, reply])
+    return root
+
+
+def format_line(result, moves):
+    """Render a line as e.g. 'draw: X(1,1) O(0,0) X(2,2) ...'"""
+    marks = ["X", "O"]
+    cells = " ".join(f"{marks[i % 2]}{CLASSIC.cell_coords(cell)}".replace(" ", "")
+                     for i, cell in enumerate(moves))
+    return f"{result}: {cells}"
+
+
+def verify(use_table=False, workers=None):
+    """Check every opening across a process pool; return the merged Outcome"""
+    total = Outcome()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(verify_opening, cell, use_table)
+                   for cell in range(CLASSIC.cells)]
+        for future in futures:
+            total.add(future.result(), [])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--table', action='store_true',
+                        help="check the memory-mapped perfect-play table")
+    parser.add_argument('--strict', action='store_true',
+                        help="also fail when X can force a draw")
+    parser.add_argument('--workers', type=int, help="worker processes")
+    parser.add_argument('--quiet', action='store_true', help="only print the summary")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    outcome = verify(args.table, args.workers)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        for result, moves in sorted(outcome.lines):
+            print(format_line(result, moves))
+    print(f"{outcome.x_wins} X wins, {outcome.draws} draws, "
+          f"{outcome.o_wins} computer wins in {elapsed:.2f}s")
+
+    failed = outcome.x_wins or (args.strict and outcome.draws)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
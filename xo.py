@@ -0,0 +1,206 @@
+"""Command-line entry point for the game window and the headless tools
+
+Only the game window imports tkinter. Every other command runs without
+a display and starts in a fraction of the time. Modules a command does
+not need (NumPy for simulate, the perfect-play table, the benchmarks)
+are only imported when that command runs.
+
+    python xo.py                                # the game window
+    python xo.py play --level Hard --size 3x3   # play in the terminal
+    python xo.py solve 4 0 --size 3x3           # best move after these cells
+    python xo.py simulate --games 100000        # options as in simulate.py
+    python xo.py bench --save                   # options as in bench.py
+"""
+import argparse
+import sys
+import time
+
+import engine
+from engine import BOARD_SIZES, MOVE_BUDGET_MS, STRATEGIES, geometry_for
+from gamelog import ABANDONED, DRAW, O_WON, X_WON, open_log
+from gamestate import GameState
+
+MESSAGES = {
+    X_WON: "🎉 You Won! 🎉",
+    O_WON: "🔥 COMPUTER WINS! 🔥",
+    DRAW: "🤝 It's a Draw! 🤝",
+}
+
+
+def render(state):
+    """Board as text, with 1-based row and column numbers
+
+    The layers of a 3D board are printed one under the other, and row
+    numbers run on from one layer to the next.
+    """
+    geometry = state.geometry
+    width = len(str(geometry.cols))
+    lines = ["   " + " ".join(f"{col + 1:>{width}}" for col in range(geometry.cols))]
+    for row in range(geometry.layers * geometry.rows):
+        if row and not row % geometry.rows:
+            lines.append("")
+        marks = (state.get(geometry.cell_index(row, col)) or "."
+                 for col in range(geometry.cols))
+        lines.append(f"{row + 1:>2} " + " ".join(f"{mark:>{width}}" for mark in marks))
+    return "\n".join(lines)
+
+
+def parse_cell(text, state):
+    """Cell for "row col" (1-based), or None unless that cell is free"""
+    try:
+        row, col = (int(part) - 1 for part in text.replace(",", " ").split())
+    except ValueError:
+        return None
+    geometry = state.geometry
+    if not (0 <= row < geometry.layers * geometry.rows and 0 <= col < geometry.cols):
+        return None
+    cell = geometry.cell_index(row, col)
+    return cell if state.is_empty(cell) else None
+
+
+def outcome(state, level):
+    """How the game ended, or None while it goes on"""
+    if state.player_won(level):
+        return X_WON
+    if state.check_winner("O"):
+        return O_WON
+    if state.is_board_full():
+        return DRAW
+    return None
+
+
+def play(level, size):
+    """Play X against the computer on stdin/stdout until the game ends or q"""
+    strategy = STRATEGIES[level]
+    state = GameState.start(geometry_for(size))
+    game_log = open_log()
+    result = None
+    try:
+        while result is None:
+            print(render(state))
+            cell = None
+            while cell is None:
+                try:
+                    text = input("Your move (row col, q to quit): ").strip()
+                except EOFError:
+                    text = "q"
+                if text.lower() in ("q", "quit"):
+                    return 0
+                cell = parse_cell(text, state)
+                if cell is None:
+                    print("That is not a free cell")
+            state = state.play(cell)
+            result = outcome(state, level)
+            if result is not None:
+                break
+
+            start = time.perf_counter()
+            move = strategy(state.board())
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            state = state.play(move)
+            row, col = state.geometry.cell_coords(move)
+            print(f"Computer plays {row + 1} {col + 1} ({elapsed_ms:.0f} ms)")
+            result = outcome(state, level)
+        print(render(state))
+        print(MESSAGES[result])
+        return 0
+    finally:
+        if game_log is not None:
+            if result is not None:
+                game_log.append(level, size, result, state.moves)
+            elif state.moves:
+                game_log.append(level, size, ABANDONED, state.moves)
+            game_log.close()
+
+
+def describe(score, search, exhaustive, complete):
+    """Words for a standard search score, which is positive when O is ahead
+
+    exhaustive says the search tried every move, complete that it also
+    reached the end of the game. Anything less is only an estimate.
+    """
+    hedge = "" if exhaustive else " (estimate, not every move searched)"
+    if score >= search.decisive:
+        return f"O wins in {search.win - score} plies{hedge}"
+    if score <= -search.decisive:
+        return f"X wins in {search.win + score} plies{hedge}"
+    if exhaustive and complete:
+        return "draw with best play"
+    return f"unclear, evaluation {(score - search.draw) / search.horizon:+.2f} for O"
+
+
+def solve(moves, size, budget_ms):
+    """Print the best move for whoever is to move after moves"""
+    geometry = geometry_for(size)
+    state = GameState.start(geometry)
+    for cell in moves:
+        state = state.play(cell)
+    print(render(state))
+    if state.check_winner("X") or state.check_winner("O") or state.is_board_full():
+        print("The game is over")
+        return 0
+
+    player = state.to_move()
+    search = engine.searches_for(geometry)[0]
+    # The classic board is solved outright; larger ones get the budget
+    budget_ms = None if geometry == engine.CLASSIC else budget_ms
+    found = search.best_move(state.board(), player == "O", budget_ms)
+    # Larger boards only search the candidate cells from ordered_moves
+    exhaustive = geometry.is_small
+    complete = found.depth >= geometry.cells - len(state.moves)
+    row, col = geometry.cell_coords(found.move)
+    print(f"{player} to move: best {row + 1} {col + 1} (cell {found.move}), "
+          f"{describe(found.score, search, exhaustive, complete)}")
+    print(f"depth {found.depth}, {found.nodes:,} nodes, {found.elapsed_ms:.1f} ms")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('gui', help="open the game window (the default)")
+
+    play_parser = commands.add_parser('play', help="play against the computer in the terminal")
+    play_parser.add_argument('--level', choices=list(STRATEGIES), default='Hard')
+    play_parser.add_argument('--size', choices=list(BOARD_SIZES), default='3x3')
+
+    solve_parser = commands.add_parser('solve', help="best move and value of a position")
+    solve_parser.add_argument('moves', nargs='*', type=int,
+                              help="cells played so far, X first")
+    solve_parser.add_argument('--size', choices=list(BOARD_SIZES), default='3x3')
+    solve_parser.add_argument('--budget-ms', type=float, default=MOVE_BUDGET_MS * 4,
+                              help="search time on boards larger than 3x3")
+
+    # These hand the rest of the command line to the module's own parser
+    commands.add_parser('simulate', help="batch self-play, see simulate.py", add_help=False)
+    commands.add_parser('bench', help="benchmarks, see bench.py", add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if rest and args.command not in ('simulate', 'bench'):
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    if args.command in (None, 'gui'):
+        # The only command that needs tkinter and a display
+        from harish import FlameXOGame
+
+        FlameXOGame().run()
+        return 0
+    if args.command == 'play':
+        engine.use_perfect_table()
+        return play(args.level, args.size)
+    if args.command == 'solve':
+        try:
+            return solve(args.moves, args.size, args.budget_ms)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.command == 'simulate':
+        import simulate
+
+        return simulate.main(rest) or 0
+    import bench
+
+    return bench.main(rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())